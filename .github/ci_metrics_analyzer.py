@@ -1,11 +1,101 @@
 #!/usr/bin/env python3
 """CI Metrics Analyzer: Auto-generate optimization recommendations."""
+import functools
 import json
+import operator
 import os
+import re
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_LEVEL_RE = re.compile(r'Level ([1-4])')
+
+
+def _in_range(value: float, bounds) -> bool:
+    """True when lower < value <= upper."""
+    lower, upper = bounds
+    return lower < value <= upper
+
+
+# (metric key, threshold, comparison, recommendations) evaluated in order
+RULES = [
+    ('test_duration_sec', 30, operator.gt, (
+        'Level 2.1: Test filtering - skip unrelated tests',
+        'Level 3.1: ML test prediction - reduce suite by 30-50%',
+    )),
+    ('test_duration_sec', 60, operator.gt, (
+        'Level 2.4: Test sharding - split across 4 runners',
+        'Level 3.1: Implement smart test selection',
+    )),
+    ('docker_duration_sec', 120, operator.gt, (
+        'Level 1.3: Multi-stage Dockerfile (20-30% faster)',
+        'Level 1.3: Add .dockerignore (reduce context)',
+        'Level 3.4: Distributed caching system',
+    )),
+    ('docker_duration_sec', (60, 120), _in_range, (
+        'Level 1.3: Reorder Dockerfile (system deps -> pip -> code)',
+        'Level 2.2: Skip Docker on feature branches',
+    )),
+    ('lint_duration_sec', 10, operator.gt, (
+        'Level 1.4: Cache linting results (skip if no code changes)',
+        'Level 1.4: Reduce complexity threshold 10 -> 12',
+    )),
+    ('cache_hit_rate', 0.6, operator.lt, (
+        'Level 1.2: Optimize pip cache key (include hash)',
+        'Level 3.4: Implement S3/MinIO global cache backend',
+    )),
+    ('test_flakiness_rate', 0.1, operator.gt, (
+        'Level 1.2: Add pytest-timeout to prevent hangs',
+        'Level 1.2: Mark slow/flaky tests with @pytest.mark.flaky',
+        'Level 2.3: Implement performance benchmarking',
+    )),
+]
+RULES_BY_KEY: Dict[str, list] = {}
+for _key, _threshold, _compare, _recs in RULES:
+    RULES_BY_KEY.setdefault(_key, []).append((_threshold, _compare, _recs))
+RULE_KEYS = tuple(RULES_BY_KEY)
+
+
+@functools.lru_cache(maxsize=64)
+def _rule_recommendations(key: str, value: float) -> tuple:
+    """Recommendations triggered by value for key, memoized per exact value."""
+    return tuple(
+        rec
+        for threshold, compare, recs in RULES_BY_KEY.get(key, ())
+        if compare(value, threshold)
+        for rec in recs
+    )
+
+
+def _read_json(path) -> Dict:
+    """Read a JSON file, using orjson when available."""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, obj) -> None:
+    """Write obj as indented JSON, using orjson when available."""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, 'w') as f:
+        json.dump(obj, f, indent=2)
+
 class CIMetricsAnalyzer:
     """Analyze CI/CD performance and suggest optimizations."""
     
@@ -14,53 +104,29 @@ class CIMetricsAnalyzer:
         self.recommendations = []
         self.baseline_file = Path('.metrics/baseline.json')
         
+    def _apply_rules(self, key: str, value: float) -> List[str]:
+        """Collect the recommendations of every rule for key that value triggers."""
+        return list(_rule_recommendations(key, value))
+    
     def analyze_test_duration(self, duration_sec: float) -> List[str]:
         """Suggest optimizations based on test duration."""
-        recs = []
-        if duration_sec > 30:
-            recs.append('Level 2.1: Test filtering - skip unrelated tests')
-            recs.append('Level 3.1: ML test prediction - reduce suite by 30-50%')
-        if duration_sec > 60:
-            recs.append('Level 2.4: Test sharding - split across 4 runners')
-            recs.append('Level 3.1: Implement smart test selection')
-        return recs
+        return self._apply_rules('test_duration_sec', duration_sec)
     
     def analyze_docker_build(self, duration_sec: float) -> List[str]:
         """Suggest Docker optimizations."""
-        recs = []
-        if duration_sec > 120:
-            recs.append('Level 1.3: Multi-stage Dockerfile (20-30% faster)')
-            recs.append('Level 1.3: Add .dockerignore (reduce context)')
-            recs.append('Level 3.4: Distributed caching system')
-        elif duration_sec > 60:
-            recs.append('Level 1.3: Reorder Dockerfile (system deps -> pip -> code)')
-            recs.append('Level 2.2: Skip Docker on feature branches')
-        return recs
+        return self._apply_rules('docker_duration_sec', duration_sec)
     
     def analyze_lint_duration(self, duration_sec: float) -> List[str]:
         """Suggest linting optimizations."""
-        recs = []
-        if duration_sec > 10:
-            recs.append('Level 1.4: Cache linting results (skip if no code changes)')
-            recs.append('Level 1.4: Reduce complexity threshold 10 -> 12')
-        return recs
+        return self._apply_rules('lint_duration_sec', duration_sec)
     
     def analyze_cache_effectiveness(self, hit_rate: float) -> List[str]:
         """Suggest caching improvements."""
-        recs = []
-        if hit_rate < 0.6:
-            recs.append('Level 1.2: Optimize pip cache key (include hash)')
-            recs.append('Level 3.4: Implement S3/MinIO global cache backend')
-        return recs
+        return self._apply_rules('cache_hit_rate', hit_rate)
     
     def analyze_flakiness(self, failure_rate: float) -> List[str]:
         """Detect and suggest fixes for flaky tests."""
-        recs = []
-        if failure_rate > 0.1:
-            recs.append('Level 1.2: Add pytest-timeout to prevent hangs')
-            recs.append('Level 1.2: Mark slow/flaky tests with @pytest.mark.flaky')
-            recs.append('Level 2.3: Implement performance benchmarking')
-        return recs
+        return self._apply_rules('test_flakiness_rate', failure_rate)
     
     def generate_report(self, job_metrics: Dict) -> Dict:
         """Generate comprehensive optimization report."""
@@ -71,69 +137,58 @@ class CIMetricsAnalyzer:
             'priority': []
         }
         
-        # Analyze each metric
-        if 'test_duration_sec' in job_metrics:
-            report['recommendations'].extend(
-                self.analyze_test_duration(job_metrics['test_duration_sec'])
-            )
-        
-        if 'docker_duration_sec' in job_metrics:
-            report['recommendations'].extend(
-                self.analyze_docker_build(job_metrics['docker_duration_sec'])
-            )
-        
-        if 'lint_duration_sec' in job_metrics:
-            report['recommendations'].extend(
-                self.analyze_lint_duration(job_metrics['lint_duration_sec'])
-            )
-        
-        if 'cache_hit_rate' in job_metrics:
-            report['recommendations'].extend(
-                self.analyze_cache_effectiveness(job_metrics['cache_hit_rate'])
-            )
-        
-        if 'test_flakiness_rate' in job_metrics:
-            report['recommendations'].extend(
-                self.analyze_flakiness(job_metrics['test_flakiness_rate'])
-            )
-        
         # Deduplicate & prioritize
-        report['recommendations'] = list(set(report['recommendations']))
+        report['recommendations'] = list(dict.fromkeys(
+            rec
+            for key in RULE_KEYS
+            if (value := job_metrics.get(key)) is not None
+            for rec in _rule_recommendations(key, value)
+        ))
         report['priority'] = self._prioritize(report['recommendations'])
         
         return report
     
     def _prioritize(self, recommendations: List[str]) -> List[str]:
         """Sort recommendations by level and impact."""
-        level_order = {'Level 1': 0, 'Level 2': 1, 'Level 3': 2, 'Level 4': 3}
-        return sorted(
-            recommendations,
-            key=lambda x: level_order.get(
-                [k for k in level_order if k in x][0] if any(k in x for k in level_order) else 'Level 4',
-                999
-            )
-        )
+        # Unlabelled recommendations rank alongside Level 4
+        ranks = [
+            int(m.group(1)) if (m := _LEVEL_RE.search(rec)) else 4
+            for rec in recommendations
+        ]
+        return [rec for _, rec in sorted(zip(ranks, recommendations))]
     
     def compare_with_baseline(self, current_metrics: Dict) -> Dict:
         """Compare against baseline and detect regressions."""
         if not self.baseline_file.exists():
             return {'status': 'no_baseline', 'changes': {}}
         
-        with open(self.baseline_file) as f:
-            baseline = json.load(f)
+        baseline = _read_json(self.baseline_file)
         
-        changes = {}
-        for key, current_val in current_metrics.items():
-            if key in baseline:
+        keys = [k for k in current_metrics if k in baseline]
+        if np is not None and keys:
+            cur = np.fromiter((current_metrics[k] for k in keys), dtype=float, count=len(keys))
+            base = np.fromiter((baseline[k] for k in keys), dtype=float, count=len(keys))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pct = np.where(base != 0, (cur - base) / base * 100, 0.0)
+            flagged = [(keys[i], float(pct[i])) for i in np.flatnonzero(np.abs(pct) > 5)]
+        else:
+            flagged = []
+            for key in keys:
                 baseline_val = baseline[key]
-                pct_change = ((current_val - baseline_val) / baseline_val * 100) if baseline_val != 0 else 0
-                if abs(pct_change) > 5:  # Flag >5% change
-                    changes[key] = {
-                        'baseline': baseline_val,
-                        'current': current_val,
-                        'change_pct': pct_change,
-                        'alert': 'regression' if pct_change > 0 else 'improvement'
-                    }
+                pct_change = ((current_metrics[key] - baseline_val) / baseline_val * 100) if baseline_val != 0 else 0
+                if abs(pct_change) > 5:
+                    flagged.append((key, pct_change))
+        
+        # Flag >5% change
+        changes = {
+            key: {
+                'baseline': baseline[key],
+                'current': current_metrics[key],
+                'change_pct': pct_change,
+                'alert': 'regression' if pct_change > 0 else 'improvement'
+            }
+            for key, pct_change in flagged
+        }
         
         return {'status': 'compared', 'changes': changes}
     
@@ -183,5 +238,4 @@ if __name__ == '__main__':
     
     # Save report
     os.makedirs('.metrics', exist_ok=True)
-    with open('.metrics/latest_report.json', 'w') as f:
-        json.dump({'report': report, 'comparison': comparison}, f, indent=2)
+    _write_json('.metrics/latest_report.json', {'report': report, 'comparison': comparison})
@@ -14,11 +14,13 @@ Features:
 """
 
 import json
+import mmap
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Tuple, Any
-import pickle
 import warnings
 
 warnings.filterwarnings('ignore')
@@ -31,10 +33,34 @@ try:
 except ImportError:
     SKLEARN_AVAILABLE = False
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _load_json_file(path: Path) -> Any:
+    """Load one history file, returning None if it can't be parsed."""
+    try:
+        with open(path, "rb") as f:
+            if orjson is None:
+                return json.loads(f.read())
+            # Parse straight from the page cache without copying into bytes
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+    except Exception as e:
+        print(f"Warning: Could not load {path}: {e}")
+        return None
+
 
 class CIMLPredictor:
     """ML-based CI/CD pipeline predictor and anomaly detector."""
 
+    # Parsed history shared across instances: data_dir -> (fingerprint, loaded_at, runs)
+    _history_cache: Dict[Path, Tuple[Tuple, float, List[Dict[str, Any]]]] = {}
+    history_cache_ttl = 60.0
+
     def __init__(self, data_dir: str = ".github/test_data"):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
@@ -43,15 +69,60 @@ class CIMLPredictor:
         self.anomaly_detector = None
 
     def load_historical_data(self) -> List[Dict[str, Any]]:
-        """Load historical test data."""
+        """Load historical test data.
+
+        Parsed runs are reused for up to history_cache_ttl seconds as long
+        as the files on disk are unchanged.
+        """
+        if not self.data_dir.exists():
+            return []
+
+        history_file = self.data_dir / "history.ndjson"
+        if history_file.exists():
+            stat = history_file.stat()
+            files = [history_file]
+            fingerprint = (stat.st_mtime_ns, stat.st_size)
+        else:
+            # Legacy layout: one test_data_*.json file per run
+            with os.scandir(self.data_dir) as it:
+                entries = [
+                    (e.name, e.stat().st_mtime_ns) for e in it
+                    if e.name.startswith("test_data_") and e.name.endswith(".json")
+                ]
+            if not entries:
+                return []
+            entries.sort()
+            files = [self.data_dir / name for name, _ in entries]
+            fingerprint = (max(mtime for _, mtime in entries), len(entries))
+
+        cached = self._history_cache.get(self.data_dir)
+        now = time.monotonic()
+        if cached and cached[0] == fingerprint and now - cached[1] < self.history_cache_ttl:
+            return list(cached[2])
+
+        if files[0] == history_file:
+            data = self._load_history_file(history_file)
+        else:
+            with ThreadPoolExecutor(max_workers=min(8, len(files))) as executor:
+                loaded = executor.map(_load_json_file, files)
+            data = [d for d in loaded if d is not None]
+
+        self._history_cache[self.data_dir] = (fingerprint, now, data)
+        return list(data)
+
+    @staticmethod
+    def _load_history_file(path: Path) -> List[Dict[str, Any]]:
+        """Read every run from an NDJSON history file in one sequential pass."""
+        loads = orjson.loads if orjson is not None else json.loads
         data = []
-        if self.data_dir.exists():
-            for file in sorted(self.data_dir.glob("test_data_*.json")):
+        with open(path, "rb") as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
                 try:
-                    with open(file) as f:
-                        data.append(json.load(f))
+                    data.append(loads(line))
                 except Exception as e:
-                    print(f"Warning: Could not load {file}: {e}")
+                    print(f"Warning: Could not parse {path}:{lineno}: {e}")
         return data
 
     def extract_features(self, test_data: Dict[str, Any]) -> Dict[str, float]:
@@ -66,19 +137,37 @@ class CIMLPredictor:
         }
         return features
 
+    @staticmethod
+    def _anomaly_matrix(features_list: List[Dict]) -> "np.ndarray":
+        """Build the (pass_rate, avg_duration) matrix used by the detector."""
+        X = np.empty((len(features_list), 2), dtype=np.float32)
+        for i, f in enumerate(features_list):
+            X[i, 0] = f.get("pass_rate", 100.0)
+            X[i, 1] = f.get("avg_duration", 0.0)
+        return X
+
+    @staticmethod
+    def _fit_detector(X: "np.ndarray") -> "IsolationForest":
+        """Return an IsolationForest fitted on X.
+
+        Fitting 50 trees on two features takes milliseconds, and every run
+        brings new history, so the detector is not persisted between runs.
+        """
+        # 50 trees is plenty for a 2-feature problem
+        detector = IsolationForest(
+            n_estimators=50, contamination=0.1, random_state=42, n_jobs=-1
+        )
+        return detector.fit(X)
+
     def detect_anomalies(self, features_list: List[Dict]) -> List[Dict]:
         """Detect anomalies in test data using Isolation Forest."""
         if not SKLEARN_AVAILABLE or len(features_list) < 2:
             return []
 
         try:
-            X = np.array([[f.get("pass_rate"), f.get("avg_duration")] 
-                         for f in features_list])
-            
-            self.anomaly_detector = IsolationForest(
-                contamination=0.1, random_state=42
-            )
-            predictions = self.anomaly_detector.fit_predict(X)
+            X = self._anomaly_matrix(features_list)
+            self.anomaly_detector = self._fit_detector(X)
+            predictions = self.anomaly_detector.predict(X)
             
             anomalies = []
             for idx, pred in enumerate(predictions):
@@ -93,6 +182,18 @@ class CIMLPredictor:
             print(f"Anomaly detection error: {e}")
             return []
 
+    def is_anomaly(self, current_features: Dict) -> bool:
+        """Score only the current run against the fitted detector."""
+        if self.anomaly_detector is None:
+            return False
+
+        try:
+            X = self._anomaly_matrix([current_features])
+            return bool(self.anomaly_detector.predict(X)[0] == -1)
+        except Exception as e:
+            print(f"Anomaly detection error: {e}")
+            return False
+
     def predict_failure_risk(self, current_features: Dict) -> float:
         """Predict risk of test failure (0-1 scale)."""
         risk_score = 0.0
@@ -137,6 +238,7 @@ class CIMLPredictor:
             "timestamp": datetime.now().isoformat(),
             "risk_score": 0.0,
             "anomalies": [],
+            "current_anomaly": False,
             "recommendations": []
         }
         
@@ -150,6 +252,7 @@ class CIMLPredictor:
         # Detect anomalies
         if all_features:
             result["anomalies"] = self.detect_anomalies(all_features)
+            result["current_anomaly"] = self.is_anomaly(current_features)
         
         # Predict failure risk
         risk_score = self.predict_failure_risk(current_features)
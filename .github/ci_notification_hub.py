@@ -14,23 +14,71 @@ Features:
 - Message templates
 """
 
+import atexit
 import os
 import json
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.message import EmailMessage
 from datetime import datetime
 from typing import Dict, List, Optional
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from abc import ABC, abstractmethod
 
 
+def _build_session() -> requests.Session:
+    """Create a keep-alive HTTP session with exponential-backoff retries."""
+    session = requests.Session()
+    # Alerts are POSTed, so only retry when the request can't have been
+    # delivered: connection failures and 429 rate limits. A 5xx may have
+    # already posted the message, and retrying it would duplicate the alert.
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=0,
+        other=0,
+        status=3,
+        backoff_factor=0.5,
+        status_forcelist=(429,),
+        allowed_methods=frozenset({'POST'}),
+    )
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry))
+    return session
+
+
+# Shared by every Slack/Telegram notifier so they use one connection pool
+_HTTP_SESSION = _build_session()
+atexit.register(_HTTP_SESSION.close)
+
+_EMAIL_TEXT_TEMPLATE = "{title}\n\n{message}\n\nRisk Level: {risk_level}\nTime: {timestamp}".format
+_EMAIL_HTML_TEMPLATE = """
+<html>
+  <body>
+    <h2 style="color: {color}">⚠️  {title}</h2>
+    <p>{message}</p>
+    <hr>
+    <p><b>Risk Level:</b> {risk_level}</p>
+    <p><b>Time:</b> {timestamp}</p>
+  </body>
+</html>
+""".format
+_TELEGRAM_TEMPLATE = "{emoji} **{title}**\n\n{message}\n\n_Risk: {risk_level} | Time: {timestamp}_".format
+
+
 class NotificationChannel(ABC):
     """Base class for notification channels."""
     
     @abstractmethod
-    def send(self, title: str, message: str, risk_level: str) -> bool:
-        """Send notification. Returns True if successful."""
+    def send(self, title: str, message: str, risk_level: str,
+             timestamp: Optional[str] = None) -> bool:
+        """Send notification. Returns True if successful.
+        
+        ``timestamp`` is shared by all channels of one dispatch; it defaults
+        to the current time when a channel is used on its own.
+        """
         pass
 
 
@@ -40,7 +88,8 @@ class SlackNotifier(NotificationChannel):
     def __init__(self, webhook_url: Optional[str] = None):
         self.webhook_url = webhook_url or os.getenv('SLACK_WEBHOOK_URL')
     
-    def send(self, title: str, message: str, risk_level: str) -> bool:
+    def send(self, title: str, message: str, risk_level: str,
+             timestamp: Optional[str] = None) -> bool:
         """Send notification to Slack."""
         if not self.webhook_url:
             print("⚠️  Slack webhook URL not configured")
@@ -60,13 +109,13 @@ class SlackNotifier(NotificationChannel):
                 'text': message,
                 'fields': [
                     {'title': 'Risk Level', 'value': risk_level, 'short': True},
-                    {'title': 'Timestamp', 'value': datetime.now().isoformat(), 'short': True}
+                    {'title': 'Timestamp', 'value': timestamp or datetime.now().isoformat(timespec='seconds'), 'short': True}
                 ]
             }]
         }
         
         try:
-            response = requests.post(self.webhook_url, json=payload, timeout=10)
+            response = _HTTP_SESSION.post(self.webhook_url, json=payload, timeout=10)
             return response.status_code == 200
         except Exception as e:
             print(f"❌ Slack notification failed: {e}")
@@ -82,37 +131,69 @@ class EmailNotifier(NotificationChannel):
         self.sender = os.getenv('NOTIFICATION_EMAIL_SENDER')
         self.password = os.getenv('NOTIFICATION_EMAIL_PASSWORD')
         self.recipients = os.getenv('NOTIFICATION_EMAIL_RECIPIENTS', '').split(',')
+        self._smtp: Optional[smtplib.SMTP] = None
+        # smtplib.SMTP isn't thread-safe, and NotificationHub.notify can leave a
+        # send running while the next notify() starts one on another thread
+        self._smtp_lock = threading.Lock()
+        # Log out of the persistent session at interpreter exit, like _HTTP_SESSION
+        atexit.register(self.close)
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Open an authenticated SMTP session."""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.starttls()
+        server.login(self.sender, self.password)
+        return server
+    
+    def _get_smtp(self) -> smtplib.SMTP:
+        """Return the cached SMTP session, reconnecting if it went stale."""
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = None
+        self._smtp = self._connect()
+        return self._smtp
+    
+    def close(self) -> None:
+        """Close the cached SMTP session, if any."""
+        with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._smtp = None
     
-    def send(self, title: str, message: str, risk_level: str) -> bool:
+    def send(self, title: str, message: str, risk_level: str,
+             timestamp: Optional[str] = None) -> bool:
         """Send email notification."""
         if not self.sender or not self.password:
             print("⚠️  Email credentials not configured")
             return False
         
         try:
-            msg = MIMEMultipart('alternative')
+            timestamp = timestamp or datetime.now().isoformat(timespec='seconds')
+            msg = EmailMessage()
             msg['Subject'] = f"[{risk_level}] {title}"
             msg['From'] = self.sender
             msg['To'] = ', '.join(self.recipients)
             
-            html_body = f"""
-            <html>
-              <body>
-                <h2 style="color: {'red' if risk_level == 'CRITICAL' else 'orange'}">⚠️  {title}</h2>
-                <p>{message}</p>
-                <hr>
-                <p><b>Risk Level:</b> {risk_level}</p>
-                <p><b>Time:</b> {datetime.now().isoformat()}</p>
-              </body>
-            </html>
-            """
-            
-            msg.attach(MIMEText(html_body, 'html'))
+            context = {'title': title, 'message': message, 'risk_level': risk_level, 'timestamp': timestamp}
+            msg.set_content(_EMAIL_TEXT_TEMPLATE(**context))
+            html_body = _EMAIL_HTML_TEMPLATE(
+                color='red' if risk_level == 'CRITICAL' else 'orange', **context
+            )
+            msg.add_alternative(html_body, subtype='html')
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender, self.password)
-                server.send_message(msg)
+            with self._smtp_lock:
+                try:
+                    self._get_smtp().send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # Server dropped us between the health check and the send
+                    self._smtp = None
+                    self._get_smtp().send_message(msg)
             
             return True
         except Exception as e:
@@ -128,7 +209,8 @@ class TelegramNotifier(NotificationChannel):
         self.chat_id = chat_id or os.getenv('TELEGRAM_CHAT_ID')
         self.api_url = f"https://api.telegram.org/bot{self.bot_token}"
     
-    def send(self, title: str, message: str, risk_level: str) -> bool:
+    def send(self, title: str, message: str, risk_level: str,
+             timestamp: Optional[str] = None) -> bool:
         """Send Telegram notification."""
         if not self.bot_token or not self.chat_id:
             print("⚠️  Telegram credentials not configured")
@@ -141,10 +223,16 @@ class TelegramNotifier(NotificationChannel):
             'OK': '✅'
         }
         
-        text = f"{emoji_map.get(risk_level, '📢')} **{title}**\n\n{message}\n\n_Risk: {risk_level} | Time: {datetime.now().isoformat()}_"
+        text = _TELEGRAM_TEMPLATE(
+            emoji=emoji_map.get(risk_level, '📢'),
+            title=title,
+            message=message,
+            risk_level=risk_level,
+            timestamp=timestamp or datetime.now().isoformat(timespec='seconds')
+        )
         
         try:
-            response = requests.post(
+            response = _HTTP_SESSION.post(
                 f"{self.api_url}/sendMessage",
                 json={"chat_id": self.chat_id, "text": text, "parse_mode": "Markdown"},
                 timeout=10
@@ -163,7 +251,11 @@ class NotificationHub:
         self._initialize_channels()
     
     def _initialize_channels(self):
-        """Initialize configured notification channels."""
+        """Initialize configured notification channels, fastest first."""
+        # Telegram
+        if os.getenv('TELEGRAM_BOT_TOKEN'):
+            self.channels.append(TelegramNotifier())
+        
         # Slack
         if os.getenv('SLACK_WEBHOOK_URL'):
             self.channels.append(SlackNotifier())
@@ -171,26 +263,33 @@ class NotificationHub:
         # Email
         if os.getenv('NOTIFICATION_EMAIL_SENDER'):
             self.channels.append(EmailNotifier())
-        
-        # Telegram
-        if os.getenv('TELEGRAM_BOT_TOKEN'):
-            self.channels.append(TelegramNotifier())
     
     def notify(self, title: str, message: str, risk_level: str = 'INFO') -> bool:
-        """Send notification to all configured channels."""
+        """Send notification to all configured channels.
+        
+        Returns as soon as one channel reports success; the remaining sends
+        finish in the background.
+        """
         if not self.channels:
             print("⚠️  No notification channels configured")
             return False
         
-        results = []
-        for channel in self.channels:
+        timestamp = datetime.now().isoformat(timespec='seconds')
+        
+        def _send(channel: NotificationChannel) -> bool:
             try:
-                result = channel.send(title, message, risk_level)
-                results.append(result)
+                return channel.send(title, message, risk_level, timestamp)
             except Exception as e:
                 print(f"❌ Channel error: {e}")
+                return False
         
-        return any(results)
+        # Channels are independent network calls, so fan them out concurrently
+        executor = ThreadPoolExecutor(max_workers=len(self.channels))
+        try:
+            futures = [executor.submit(_send, channel) for channel in self.channels]
+            return any(future.result() for future in as_completed(futures))
+        finally:
+            executor.shutdown(wait=False)
 
 
 if __name__ == "__main__":
@@ -3,9 +3,92 @@
 import json
 import os
 import subprocess
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+    try:
+        ijson = ijson.get_backend('yajl2_c')
+    except ImportError:
+        pass
+except ImportError:
+    ijson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _optional_njit(func):
+    """JIT-compile func with Numba when it is installed, else return it unchanged."""
+    try:
+        from numba import njit
+    except ImportError:
+        return func
+    return njit(cache=True)(func)
+
+
+@_optional_njit
+def _pct_increase(current, baseline):
+    """Percentage change of current over baseline for two aligned float arrays."""
+    out = np.empty(current.shape[0], np.float64)
+    for i in range(current.shape[0]):
+        if baseline[i] != 0.0:
+            out[i] = (current[i] - baseline[i]) / baseline[i] * 100.0
+        else:
+            out[i] = 0.0
+    return out
+
+_PR_COMMENT_HEADER = (
+    "### ⚠️ Performance Regressions Detected\n\n"
+    "| Function | Baseline | Current | Increase | Severity |\n"
+    "|----------|----------|---------|----------|----------|\n"
+)
+_PR_COMMENT_ROW = "| `{function}` | {baseline_ms:.2f}ms | {current_ms:.2f}ms | +{increase_pct:.1f}% | {severity} |\n".format
+_PR_COMMENT_FOOTER = "\n> Run `python .github/ci_profiler.py` locally to investigate\n"
+
+
+def _read_json(path) -> dict:
+    """Read a JSON file, using orjson when available."""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, obj) -> None:
+    """Write obj as indented JSON, using orjson when available."""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, 'w') as f:
+        json.dump(obj, f, indent=2)
+
+
+def _iter_benchmark_means(path):
+    """Yield (name, mean) pairs from a pytest-benchmark JSON report.
+
+    Streams the report with ijson when available so the per-round stats
+    are never materialized.
+    """
+    if ijson is not None:
+        with open(path, 'rb') as f:
+            for benchmark in ijson.items(f, 'benchmarks.item'):
+                yield benchmark['name'], float(benchmark['stats']['mean'])
+        return
+    for benchmark in _read_json(path).get('benchmarks', []):
+        yield benchmark['name'], benchmark['stats']['mean']
+
 class CIProfiler:
     """Profile code execution and detect performance regressions."""
     
@@ -19,43 +102,47 @@ class CIProfiler:
         if not baseline_file.exists():
             return {}
         
-        with open(baseline_file) as f:
-            return json.load(f)
+        return _read_json(baseline_file)
     
     def detect_regressions(self, current: dict, baseline: dict) -> list:
         """Detect performance regressions vs baseline."""
-        regressions = []
-        
-        for func, current_time in current.items():
-            if func in baseline:
+        # One C-level set intersection instead of a membership probe per function
+        funcs = sorted(current.keys() & baseline.keys())
+        if np is not None and funcs:
+            cur = np.fromiter((current[f] for f in funcs), dtype=np.float64, count=len(funcs))
+            base = np.fromiter((baseline[f] for f in funcs), dtype=np.float64, count=len(funcs))
+            pct = _pct_increase(cur, base)
+            # Alert if >20% slowdown
+            flagged = [(funcs[i], float(pct[i])) for i in np.flatnonzero(pct > 20)]
+        else:
+            flagged = []
+            for func in funcs:
                 baseline_time = baseline[func]
-                pct_increase = ((current_time - baseline_time) / baseline_time) * 100
-                
-                if pct_increase > 20:  # Alert if >20% slowdown
-                    regressions.append({
-                        'function': func,
-                        'baseline_ms': baseline_time,
-                        'current_ms': current_time,
-                        'increase_pct': pct_increase,
-                        'severity': 'critical' if pct_increase > 50 else 'warning'
-                    })
-        
-        return regressions
+                pct_increase = ((current[func] - baseline_time) / baseline_time) * 100 if baseline_time else 0.0
+                if pct_increase > 20:
+                    flagged.append((func, pct_increase))
+        
+        return [
+            {
+                'function': func,
+                'baseline_ms': baseline[func],
+                'current_ms': current[func],
+                'increase_pct': pct_increase,
+                'severity': 'critical' if pct_increase > 50 else 'warning'
+            }
+            for func, pct_increase in flagged
+        ]
     
     def generate_pr_comment(self, regressions: list) -> str:
         """Generate GitHub PR comment with profiling results."""
         if not regressions:
             return "### ⚡ Performance: No regressions detected"
         
-        comment = "### ⚠️ Performance Regressions Detected\n\n"
-        comment += "| Function | Baseline | Current | Increase | Severity |\n"
-        comment += "|----------|----------|---------|----------|----------|\n"
-        
-        for reg in regressions:
-            comment += f"| `{reg['function']}` | {reg['baseline_ms']:.2f}ms | {reg['current_ms']:.2f}ms | +{reg['increase_pct']:.1f}% | {reg['severity'].upper()} |\n"
-        
-        comment += "\n> Run `python .github/ci_profiler.py` locally to investigate\n"
-        return comment
+        rows = [
+            _PR_COMMENT_ROW(**{**reg, 'severity': reg['severity'].upper()})
+            for reg in regressions
+        ]
+        return ''.join((_PR_COMMENT_HEADER, *rows, _PR_COMMENT_FOOTER))
     
     def profile_test_suite(self) -> dict:
         """Profile test execution times."""
@@ -68,20 +155,22 @@ class CIProfiler:
         ]
         
         try:
-            subprocess.run(cmd, check=True, capture_output=True)
-            
-            with open('.metrics/benchmark.json') as f:
-                data = json.load(f)
+            start_ns = time.perf_counter_ns()
+            # Results go to benchmark.json; only stderr is kept for error reporting
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            elapsed_ns = time.perf_counter_ns() - start_ns
             
             profile_data = {
-                timestamp: datetime.utcnow().isoformat(),
-                benchmarks: {}
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'suite_duration_ms': elapsed_ns / 1e6,
+                'benchmarks': dict(_iter_benchmark_means('.metrics/benchmark.json'))
             }
             
-            for benchmark in data.get('benchmarks', []):
-                profile_data['benchmarks'][benchmark['name']] = benchmark['stats']['mean']
-            
             return profile_data
+        except subprocess.CalledProcessError as e:
+            stderr = (e.stderr or b'').decode(errors='replace').strip()
+            print(f"❌ Profiling failed: {e}" + (f"\n{stderr}" if stderr else ""))
+            return {}
         except Exception as e:
             print(f"❌ Profiling failed: {e}")
             return {}
@@ -122,8 +211,7 @@ class CIProfiler:
         
         # Save current profile as new baseline for next run
         baseline_file = self.baseline_dir / "test_suite_baseline.json"
-        with open(baseline_file, 'w') as f:
-            json.dump(current_profile, f, indent=2)
+        _write_json(baseline_file, current_profile)
         
         print(f"\n💾 Baseline saved to {baseline_file}")
 
@@ -9,47 +9,117 @@ Features:
 - Test result aggregation
 - Execution timing collection
 - Coverage metrics extraction
-- Data persistence to JSON
+- Data persistence to a rolling NDJSON history
 - Benchmark comparison
 """
 
 import json
 import os
+import tempfile
 import time
+from array import array
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 import subprocess
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    from coverage import Coverage
+except ImportError:
+    Coverage = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HISTORY_FILE = "history.ndjson"
+RUNNING_STATS_FILE = "_running_stats.json"
+RUNNING_STATS_FIELDS = ("runs", "total_tests", "passed", "failed", "skipped",
+                        "total_duration", "duration_sum_sq")
+# Outcome codes for the columnar test view; anything else maps to len(OUTCOMES)
+OUTCOMES = ("passed", "failed", "skipped")
+OUTCOME_CODES = {name: code for code, name in enumerate(OUTCOMES)}
+
+
+def _loads(raw) -> Any:
+    """Parse JSON bytes/str, using orjson when available."""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize obj to JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode()
+
 
 class TestDataCollector:
     """Collects and aggregates test execution data."""
 
-    def __init__(self, output_dir: str = ".github/test_data"):
+    def __init__(self, output_dir: str = ".github/test_data", max_history: int = 500):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.history_file = self.output_dir / HISTORY_FILE
+        self.running_stats_file = self.output_dir / RUNNING_STATS_FILE
+        self.max_history = max_history
         self.timestamp = datetime.now().isoformat()
         self.data = {"timestamp": self.timestamp, "tests": [], "summary": {}}
+        # simdjson proxies are only valid while their parser is alive
+        self._report_parser = simdjson.Parser() if simdjson is not None else None
+        # (tests list, durations, outcome codes) built alongside extract_test_results
+        self._columns = None
 
     def collect_test_metrics(self) -> Dict[str, Any]:
         """Collect test execution metrics."""
         try:
-            result = subprocess.run(
+            # Only the report file is read, so discard stdout instead of piping and decoding it
+            subprocess.run(
                 ["pytest", "--json-report", "--json-report-file=.pytest_json_report"],
-                capture_output=True,
-                text=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 timeout=300,
             )
             if os.path.exists(".pytest_json_report"):
-                with open(".pytest_json_report") as f:
-                    pytest_data = json.load(f)
-                return pytest_data
+                with open(".pytest_json_report", "rb") as f:
+                    raw = f.read()
+                if self._report_parser is not None:
+                    # Lazy document: only the fields extract_test_results reads are materialized
+                    return self._report_parser.parse(raw)
+                return _loads(raw)
         except Exception as e:
             print(f"\u274c Error collecting test metrics: {e}")
         return {}
 
     def collect_coverage_metrics(self) -> Dict[str, Any]:
         """Collect code coverage metrics."""
+        if Coverage is not None:
+            try:
+                # In-process report: no interpreter spawn, read straight from .coverage
+                cov = Coverage()
+                cov.load()
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    report_path = os.path.join(tmp_dir, "coverage.json")
+                    cov.json_report(outfile=report_path)
+                    with open(report_path, "rb") as f:
+                        return _loads(f.read())
+            except Exception as e:
+                print(f"\u26a0\ufe0f  In-process coverage report failed, falling back to CLI: {e}")
         try:
             result = subprocess.run(
                 ["coverage", "report", "--json"],
@@ -58,33 +128,64 @@ class TestDataCollector:
                 timeout=60,
             )
             if result.returncode == 0:
-                return json.loads(result.stdout)
+                return _loads(result.stdout)
         except Exception as e:
             print(f"\u274c Error collecting coverage: {e}")
         return {}
 
     def extract_test_results(self, metrics: Dict[str, Any]) -> List[Dict]:
-        """Extract individual test results."""
+        """Extract individual test results.
+
+        Durations and outcome codes are also kept as flat columns so the
+        summary and running stats don't have to walk the dicts again.
+        """
         tests = []
+        durations = array("d")
+        outcomes = array("B")
+        other = len(OUTCOMES)
         if "tests" in metrics:
             for test in metrics["tests"]:
+                duration = test.get("duration", 0)
+                outcome = test.get("outcome")
                 tests.append(
                     {
                         "name": test.get("nodeid"),
-                        "duration": test.get("duration", 0),
-                        "outcome": test.get("outcome"),
-                        "markers": test.get("markers", []),
+                        "duration": duration,
+                        "outcome": outcome,
+                        "markers": list(test.get("markers", [])),
                     }
                 )
+                durations.append(duration)
+                outcomes.append(OUTCOME_CODES.get(outcome, other))
+        self._columns = (tests, durations, outcomes)
         return tests
 
+    def _test_columns(self) -> Tuple[array, array]:
+        """Return (durations, outcome codes) for self.data["tests"]."""
+        tests = self.data["tests"]
+        if self._columns is not None and self._columns[0] is tests:
+            return self._columns[1], self._columns[2]
+        # Tests were assigned directly rather than through extract_test_results
+        other = len(OUTCOMES)
+        durations = array("d", (t.get("duration", 0) for t in tests))
+        outcomes = array("B", (OUTCOME_CODES.get(t.get("outcome"), other) for t in tests))
+        self._columns = (tests, durations, outcomes)
+        return durations, outcomes
+
     def generate_summary(self) -> Dict[str, Any]:
         """Generate data summary."""
-        total_tests = len(self.data["tests"])
-        passed = sum(1 for t in self.data["tests"] if t.get("outcome") == "passed")
-        failed = sum(1 for t in self.data["tests"] if t.get("outcome") == "failed")
-        skipped = sum(1 for t in self.data["tests"] if t.get("outcome") == "skipped")
-        total_duration = sum(t.get("duration", 0) for t in self.data["tests"])
+        durations, outcomes = self._test_columns()
+        if np is not None:
+            counts = np.bincount(
+                np.frombuffer(outcomes, dtype=np.uint8), minlength=len(OUTCOMES) + 1
+            ).tolist()
+            total_duration = float(np.frombuffer(durations, dtype=np.float64).sum())
+        else:
+            counts = [outcomes.count(code) for code in range(len(OUTCOMES))]
+            total_duration = sum(durations)
+
+        total_tests = len(outcomes)
+        passed, failed, skipped = counts[:len(OUTCOMES)]
 
         return {
             "total_tests": total_tests,
@@ -96,13 +197,72 @@ class TestDataCollector:
             "avg_test_duration": (total_duration / total_tests) if total_tests > 0 else 0,
         }
 
+    def append_run(self, data: Dict[str, Any]) -> None:
+        """Append one run to the NDJSON history, trimming it to max_history runs.
+
+        The file is only rewritten once it holds roughly 2 * max_history runs,
+        so most appends cost one write instead of a full read of the history.
+        """
+        line = _dumps(data) + b"\n"
+        with open(self.history_file, "ab") as f:
+            f.write(line)
+            size = f.tell()
+        # Runs are similar in size, so this run's line length estimates the line count
+        if size > 2 * self.max_history * len(line):
+            self._compact_history()
+
+    def _compact_history(self) -> None:
+        """Keep only the most recent max_history lines of the history file."""
+        with open(self.history_file, "rb") as f:
+            lines = f.readlines()
+        if len(lines) <= self.max_history:
+            return
+        tmp_file = self.history_file.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            f.writelines(lines[-self.max_history:])
+        os.replace(tmp_file, self.history_file)
+
+    def load_running_stats(self) -> Dict[str, Any]:
+        """Return the all-time counters accumulated across saved runs."""
+        stats = dict.fromkeys(RUNNING_STATS_FIELDS, 0)
+        if self.running_stats_file.exists():
+            with open(self.running_stats_file, "rb") as f:
+                stats.update(_loads(f.read()))
+        return stats
+
+    def update_running_stats(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Fold one run's summary into the persisted running stats.
+
+        The update is O(1) in the size of the history, so aggregates never
+        require rescanning earlier runs.
+        """
+        lock_path = self.running_stats_file.with_suffix(".lock")
+        with open(lock_path, "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = self.load_running_stats()
+            stats["runs"] += 1
+            for field in ("total_tests", "passed", "failed", "skipped", "total_duration"):
+                stats[field] += summary.get(field, 0)
+            durations, _ = self._test_columns()
+            if np is not None:
+                d = np.frombuffer(durations, dtype=np.float64)
+                stats["duration_sum_sq"] += float(d @ d)
+            else:
+                stats["duration_sum_sq"] += sum(x * x for x in durations)
+
+            tmp_file = self.running_stats_file.with_suffix(".tmp")
+            with open(tmp_file, "wb") as f:
+                f.write(_dumps(stats, indent=True))
+            os.replace(tmp_file, self.running_stats_file)
+        return stats
+
     def save_data(self) -> str:
-        """Save collected data to file."""
+        """Save collected data to the rolling history file."""
         self.data["summary"] = self.generate_summary()
-        filename = self.output_dir / f"test_data_{self.timestamp.replace(':', '-')}.json"
-        with open(filename, "w") as f:
-            json.dump(self.data, f, indent=2)
-        return str(filename)
+        self.append_run(self.data)
+        self.update_running_stats(self.data["summary"])
+        return str(self.history_file)
 
     def collect_all(self) -> Dict[str, Any]:
         """Collect all test data."""
@@ -119,4 +279,4 @@ class TestDataCollector:
 if __name__ == "__main__":
     collector = TestDataCollector()
     data = collector.collect_all()
-    print(json.dumps(data["summary"], indent=2))
+    print(_dumps(data["summary"], indent=True).decode())
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 """Git diff test filter: run only tests for changed files (Level 2.1 optimization)."""
+import os
 import subprocess
 import sys
 from pathlib import Path
@@ -7,23 +8,17 @@ from typing import Set
 
 def get_changed_files() -> Set[str]:
     """Get list of files changed in current PR."""
-    try:
-        # Get merge base (common ancestor)
-        base = subprocess.check_output(
-            ['git', 'merge-base', 'HEAD', 'origin/main'],
-            text=True
-        ).strip()
-        
-        # Get diff between base and current branch
-        diff_output = subprocess.check_output(
-            ['git', 'diff', '--name-only', base, 'HEAD'],
-            text=True
-        )
-        
-        return set(diff_output.strip().split('\n'))
-    except subprocess.CalledProcessError:
+    # Single git call: diff against the merge base, NUL-separated so any path is safe
+    result = subprocess.run(
+        ['git', 'diff', '--name-only', '-z', '--merge-base', 'origin/main', 'HEAD'],
+        capture_output=True,
+        check=False
+    )
+    if result.returncode != 0:
         print("❌ Failed to get git diff. Running all tests.")
         return set()
+    
+    return {os.fsdecode(path) for path in result.stdout.split(b'\0') if path}
 
 def map_changed_to_tests(changed_files: Set[str]) -> Set[str]:
     """Map changed files to test modules."""
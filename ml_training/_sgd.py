@@ -0,0 +1,80 @@
+"""Numba-compiled logistic regression trainer for small, dense feature sets"""
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    prange = range
+
+# Above this width the sklearn solver is the better choice
+MAX_FEATURES = 16
+
+
+def _fit_lr(X, y, sample_weight, w, lr, n_epochs, batch_size):
+    """Mini-batch AdaGrad on the weighted logistic loss.
+
+    ``w`` holds the feature weights followed by the bias and is updated in place.
+    """
+    n, d = X.shape
+    g2 = np.zeros(d + 1, np.float32)
+    resid = np.empty(n, np.float32)
+    for _ in range(n_epochs):
+        for start in range(0, n, batch_size):
+            end = min(start + batch_size, n)
+            for i in prange(start, end):
+                z = w[d]
+                for j in range(d):
+                    z += X[i, j] * w[j]
+                resid[i] = (np.float32(1.0) / (np.float32(1.0) + np.exp(-z)) - y[i]) * sample_weight[i]
+            for j in prange(d + 1):
+                g = np.float32(0.0)
+                if j < d:
+                    for i in range(start, end):
+                        g += resid[i] * X[i, j]
+                else:
+                    for i in range(start, end):
+                        g += resid[i]
+                g /= np.float32(end - start)
+                g2[j] += g * g
+                w[j] -= lr * g / (np.sqrt(g2[j]) + np.float32(1e-8))
+    return w
+
+
+if HAS_NUMBA:
+    fit_lr = njit(cache=True, parallel=True, fastmath=True)(_fit_lr)
+else:
+    fit_lr = _fit_lr
+
+
+class LinearRanker:
+    """Minimal logistic model exposing the sklearn attributes train.py relies on"""
+
+    def __init__(self, coef, intercept):
+        self.coef_ = np.asarray(coef, dtype=np.float32).reshape(1, -1)
+        self.intercept_ = np.asarray([intercept], dtype=np.float32)
+
+    def decision_function(self, X):
+        return X @ self.coef_[0] + self.intercept_[0]
+
+    def predict_proba(self, X):
+        p = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack((1.0 - p, p))
+
+
+def fit_linear_ranker(X, y, lr=0.1, n_epochs=20, batch_size=256):
+    """Fit a class-balanced logistic ranker with the compiled AdaGrad loop"""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.ascontiguousarray(y, dtype=np.float32)
+
+    # Same weighting as class_weight='balanced'
+    n_pos = float(y.sum())
+    n_neg = len(y) - n_pos
+    sample_weight = np.where(
+        y > 0.5, len(y) / (2.0 * max(n_pos, 1.0)), len(y) / (2.0 * max(n_neg, 1.0))
+    ).astype(np.float32)
+
+    w = np.zeros(X.shape[1] + 1, dtype=np.float32)
+    w = fit_lr(X, y, sample_weight, w, np.float32(lr), n_epochs, batch_size)
+    return LinearRanker(w[:-1], w[-1])
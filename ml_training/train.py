@@ -5,27 +5,32 @@ import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import roc_auc_score, ndcg_score, precision_recall_curve
-import joblib
 import logging
 from pathlib import Path
 
+if __package__:
+    from ._sgd import HAS_NUMBA, MAX_FEATURES, fit_linear_ranker
+else:
+    # Run as a script (python train.py), so _sgd is a top-level sibling module
+    from _sgd import HAS_NUMBA, MAX_FEATURES, fit_linear_ranker
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def generate_synthetic_data(n_samples=5000):
     """Generate synthetic training data (Phase 2-3)"""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)  # PCG64
     
     # Features: user_id, context, frequency, recency, popularity, item_embedding (5D)
-    X = np.random.randn(n_samples, 10)
+    X = rng.standard_normal((n_samples, 10), dtype=np.float32)
     
     # Labels: click (1) vs no click (0) - binary classification
     # More likely to click if user_frequency + item_popularity is high
-    y = (X[:, 2] + X[:, 4] > 0).astype(int)  # 50% positive class
+    y = np.greater(X[:, 2], -X[:, 4]).view(np.int8)  # 50% positive class
     
-    # Add some noise
-    noise_idx = np.random.choice(n_samples, size=int(0.1 * n_samples), replace=False)
-    y[noise_idx] = 1 - y[noise_idx]
+    # Add some noise (flip 10% of labels in place)
+    noise_idx = rng.choice(n_samples, size=int(0.1 * n_samples), replace=False)
+    y[noise_idx] ^= 1
     
     return X, y
 
@@ -35,25 +40,46 @@ def train_ranker(X_train, y_train, X_val, y_val):
     
     # Feature scaling
     scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_val_scaled = scaler.transform(X_val)
-    
-    # Train model
-    model = LogisticRegression(
-        max_iter=1000,
-        random_state=42,
-        class_weight='balanced'
-    )
-    model.fit(X_train_scaled, y_train)
-    
-    # Evaluate
-    train_auc = roc_auc_score(y_train, model.predict_proba(X_train_scaled)[:, 1])
-    val_auc = roc_auc_score(y_val, model.predict_proba(X_val_scaled)[:, 1])
+    X_train_scaled = scaler.fit_transform(X_train).astype(np.float32, copy=False)
+    X_val_scaled = scaler.transform(X_val).astype(np.float32, copy=False)
+    
+    # Train model: compiled AdaGrad loop for narrow inputs, sklearn otherwise
+    if HAS_NUMBA and X_train_scaled.shape[1] <= MAX_FEATURES:
+        model = fit_linear_ranker(X_train_scaled, y_train)
+    else:
+        model = LogisticRegression(
+            solver='saga',
+            max_iter=200,
+            tol=1e-3,
+            random_state=42,
+            class_weight='balanced'
+        )
+        model.fit(X_train_scaled, y_train)
+    
+    # Evaluate (AUC is rank-based, so the raw decision function is enough)
+    train_auc = roc_auc_score(y_train, model.decision_function(X_train_scaled))
+    val_auc = roc_auc_score(y_val, model.decision_function(X_val_scaled))
     
     logger.info(f"Train AUC: {train_auc:.4f}, Val AUC: {val_auc:.4f}")
     
     return model, scaler, {'train_auc': train_auc, 'val_auc': val_auc}
 
+def save_ranker(model, scaler, path):
+    """Save the serving state of a linear ranker as float32 arrays.
+    
+    Only coef/intercept and the scaler's mean/scale are needed to score, so
+    nothing is pickled and loading is a plain np.load.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        path,
+        coef=np.asarray(model.coef_, dtype=np.float32).ravel(),
+        intercept=np.asarray(model.intercept_, dtype=np.float32).ravel(),
+        mean=scaler.mean_.astype(np.float32),
+        scale=scaler.scale_.astype(np.float32),
+    )
+
 def main():
     """Main training pipeline"""
     logger.info("Starting ML training pipeline...")
@@ -75,21 +101,15 @@ def main():
     model, scaler, metrics = train_ranker(X_train, y_train, X_val, y_val)
     
     # Test evaluation
-    X_test_scaled = scaler.transform(X_test)
-    test_auc = roc_auc_score(y_test, model.predict_proba(X_test_scaled)[:, 1])
+    X_test_scaled = scaler.transform(X_test).astype(np.float32, copy=False)
+    test_auc = roc_auc_score(y_test, model.decision_function(X_test_scaled))
     logger.info(f"Test AUC: {test_auc:.4f}")
     
     # Save model
-    model_path = Path('src/ml/models/ranker_v1.pkl')
-    model_path.parent.mkdir(parents=True, exist_ok=True)
-    joblib.dump(model, model_path)
+    model_path = Path('src/ml/models/ranker_v1.npz')
+    save_ranker(model, scaler, model_path)
     logger.info(f"Model saved to {model_path}")
     
-    # Save scaler
-    scaler_path = Path('src/ml/models/scaler_v1.pkl')
-    joblib.dump(scaler, scaler_path)
-    logger.info(f"Scaler saved to {scaler_path}")
-    
     logger.info("Training completed!")
     return metrics
 
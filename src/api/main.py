@@ -1,11 +1,18 @@
 """Predictive Propositions Service - FastAPI Application"""
 import os
 import json
+import time
+import asyncio
+from collections import deque
 from datetime import datetime
+from itertools import count, islice
 from typing import List, Optional
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
+import numpy as np
+import orjson
 import logging
 
 # Configure logging
@@ -18,7 +25,8 @@ app = FastAPI(
     description="ML-powered service for generating contextual predictive propositions",
     version="0.1.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # ============= Request/Response Models =============
@@ -53,8 +61,104 @@ class EventLog(BaseModel):
     timestamp: str
 
 # ============= In-Memory Storage (for Phase 1) =============
-events_store = []
-proposition_cache = {}
+# Bounded so the buffer can't grow without limit; oldest events are dropped first
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER", "100000"))
+events_store = deque(maxlen=EVENT_BUFFER_SIZE)
+events_dropped = 0
+SUGGEST_CACHE_TTL = float(os.getenv("SUGGEST_CACHE_TTL", "30"))
+SUGGEST_CACHE_MAX_ENTRIES = int(os.getenv("SUGGEST_CACHE_MAX_ENTRIES", "10000"))
+# (user_id, token, context, context_type, limit, device) -> propositions;
+# bounded in both size (LRU) and age (TTL)
+proposition_cache = TTLCache(maxsize=SUGGEST_CACHE_MAX_ENTRIES, ttl=SUGGEST_CACHE_TTL)
+# user_id -> invalidation token, part of every cache key. /log_event issues a
+# fresh token so the user's old entries are never hit again and simply age out.
+# Tokens only need to outlive the entries they retire, hence the same TTL
+# (an LRU-evicted token would let pre-event entries live out their TTL).
+user_cache_tokens = TTLCache(maxsize=SUGGEST_CACHE_MAX_ENTRIES, ttl=SUGGEST_CACHE_TTL)
+_next_cache_token = count(1).__next__
+
+# Phase 1 rule-based output is identical for every request; built once as plain
+# dicts so /suggest skips per-item model validation
+RULE_BASED_PROPOSITIONS = [
+    {
+        "id": f"prop_{i}",
+        "title": f"Suggestion {i+1}",
+        "confidence": 0.8 - (i * 0.1),
+        "reason": "rule-based ranking (frequency + popularity)"
+    }
+    for i in range(5)
+]
+
+# ============= Clock =============
+# ISO timestamp formatted at most once per second; hot endpoints call
+# _now_iso() instead of formatting a fresh datetime on every request. Keyed by
+# the wall-clock second, so it is never stale and needs no background task.
+_now_iso_cached = (0, "")
+
+def _now_iso() -> str:
+    """Current UTC time as a second-resolution ISO string"""
+    global _now_iso_cached
+    second = int(time.time())
+    if _now_iso_cached[0] != second:
+        _now_iso_cached = (second, datetime.utcfromtimestamp(second).isoformat())
+    return _now_iso_cached[1]
+
+# ============= Event Persistence =============
+# Append-only NDJSON event log; disabled when EVENT_LOG_PATH is unset
+EVENT_LOG_PATH = os.getenv("EVENT_LOG_PATH", "")
+EVENT_FLUSH_BATCH = 100
+EVENT_FLUSH_INTERVAL = 0.2
+event_queue: Optional[asyncio.Queue] = None
+event_flush_task: Optional[asyncio.Task] = None
+event_log_fd: Optional[int] = None
+# Queued by shutdown_event after the last event; flush_events stops on it
+_FLUSH_STOP = object()
+
+def _write_events(fd: int, batch: list) -> None:
+    """Write a batch of events with a single syscall"""
+    os.write(fd, b"".join(orjson.dumps(e) + b"\n" for e in batch))
+
+async def flush_events(queue: asyncio.Queue, fd: int):
+    """Drain queued events in batches of EVENT_FLUSH_BATCH or every EVENT_FLUSH_INTERVAL.
+    
+    Runs until _FLUSH_STOP is dequeued rather than being cancelled, so the
+    last batch is written and no write is left running when the fd closes.
+    """
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        batch = []
+        item = await queue.get()
+        deadline = loop.time() + EVENT_FLUSH_INTERVAL
+        try:
+            while True:
+                if item is _FLUSH_STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= EVENT_FLUSH_BATCH or (timeout := deadline - loop.time()) <= 0:
+                    break
+                item = await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        if not batch:
+            continue
+        try:
+            await asyncio.to_thread(_write_events, fd, batch)
+        except OSError as e:
+            # Drop this batch but keep draining; a dead flusher would let the queue grow forever
+            logger.error(f"Failed to persist {len(batch)} events: {e}")
+
+# ============= Ranker Model =============
+# Loaded at startup so /metrics can report it; /suggest keeps serving the
+# rule-based list until request features for the ranker exist (Phase 3)
+MODEL_PATH = os.getenv("MODEL_PATH", "src/ml/models/ranker_v1.npz")
+ranker_params = None
+
+def load_ranker(path: str) -> dict:
+    """Load ranker weights and scaler stats saved by ml_training/train.py"""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
 
 # ============= API Endpoints =============
 
@@ -65,7 +169,7 @@ async def health_check():
         "status": "healthy",
         "service": "predictive-propositions-service",
         "version": "0.1.0",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso()
     }
 
 @app.post("/suggest", response_model=SuggestionResponse, tags=["Suggestions"])
@@ -74,30 +178,39 @@ async def get_suggestions(request: SuggestionRequest):
     
     Returns ranked list of suggested actions based on user history and context.
     """
-    import time
     start_time = time.time()
     
     try:
+        cache_key = (
+            request.user_id, user_cache_tokens.get(request.user_id, 0),
+            request.context, request.context_type, request.limit, request.device
+        )
+        cached = proposition_cache.get(cache_key)
+        if cached is not None:
+            return ORJSONResponse({
+                "propositions": cached,
+                "served_by": "rule_based_ranker",
+                "latency_ms": round((time.time() - start_time) * 1000, 2),
+                "timestamp": _now_iso()
+            })
+        
         # Phase 1: Rule-based ranking (frequency + popularity)
         # This will be replaced with ML model in Phase 3
-        propositions = [
-            PropositionItem(
-                id=f"prop_{i}",
-                title=f"Suggestion {i+1}",
-                confidence=0.8 - (i * 0.1),
-                reason="rule-based ranking (frequency + popularity)"
-            )
-            for i in range(min(request.limit, 5))
-        ]
+        # Fixed output for now, so serve a slice of the prebuilt list
+        propositions = RULE_BASED_PROPOSITIONS[:request.limit]
+        
+        proposition_cache[cache_key] = propositions
         
         latency_ms = (time.time() - start_time) * 1000
         
-        return SuggestionResponse(
-            propositions=propositions,
-            served_by="rule_based_ranker",
-            latency_ms=round(latency_ms, 2),
-            timestamp=datetime.utcnow().isoformat()
-        )
+        # Returning the response directly bypasses response_model re-validation;
+        # response_model is kept for the OpenAPI schema
+        return ORJSONResponse({
+            "propositions": propositions,
+            "served_by": "rule_based_ranker",
+            "latency_ms": round(latency_ms, 2),
+            "timestamp": _now_iso()
+        })
         
     except Exception as e:
         logger.error(f"Error in /suggest: {str(e)}")
@@ -106,10 +219,19 @@ async def get_suggestions(request: SuggestionRequest):
 @app.post("/log_event", tags=["Events"])
 async def log_event(event: EventLog):
     """Log user interaction event (impression, click, conversion)"""
+    global events_dropped
     try:
         event_dict = event.dict()
-        event_dict["logged_at"] = datetime.utcnow().isoformat()
+        event_dict["logged_at"] = _now_iso()
+        # Second-resolution logged_at is for display; ordering uses the ns clock
+        event_dict["logged_at_ns"] = time.time_ns()
+        if len(events_store) == EVENT_BUFFER_SIZE:
+            events_dropped += 1
         events_store.append(event_dict)
+        # New interactions can change this user's ranking
+        user_cache_tokens[event.user_id] = _next_cache_token()
+        if event_queue is not None:
+            event_queue.put_nowait(event_dict)
         
         logger.info(f"Event logged: {event.event_type} for user {event.user_id}")
         
@@ -128,7 +250,8 @@ async def get_events(limit: int = Query(10, ge=1, le=1000)):
     """Retrieve logged events (development/debugging)"""
     return {
         "total_events": len(events_store),
-        "recent_events": events_store[-limit:]
+        # Walk from the newest end so the cost is O(limit), not O(buffer)
+        "recent_events": list(islice(reversed(events_store), limit))[::-1]
     }
 
 @app.get("/metrics", tags=["Monitoring"])
@@ -138,8 +261,10 @@ async def get_metrics():
         "service": "predictive-propositions-service",
         "status": "operational",
         "total_events_logged": len(events_store),
+        "events_dropped": events_dropped,
         "cache_size": len(proposition_cache),
-        "timestamp": datetime.utcnow().isoformat()
+        "model_loaded": ranker_params is not None,
+        "timestamp": _now_iso()
     }
 
 # ============= Error Handlers =============
@@ -147,7 +272,7 @@ async def get_metrics():
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Custom HTTP exception handler"""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail, "error": True}
     )
@@ -156,7 +281,7 @@ async def http_exception_handler(request, exc):
 async def general_exception_handler(request, exc):
     """Catch-all exception handler"""
     logger.error(f"Unhandled exception: {str(exc)}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": "Internal server error", "error": True}
     )
@@ -165,12 +290,29 @@ async def general_exception_handler(request, exc):
 
 @app.on_event("startup")
 async def startup_event():
+    global ranker_params, event_queue, event_flush_task, event_log_fd
     logger.info("Service starting up...")
     logger.info("Predictive Propositions Service v0.1.0")
+    if os.path.exists(MODEL_PATH):
+        ranker_params = load_ranker(MODEL_PATH)
+        logger.info(f"Ranker loaded from {MODEL_PATH}")
+    if EVENT_LOG_PATH:
+        event_log_fd = os.open(EVENT_LOG_PATH, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        event_queue = asyncio.Queue()
+        event_flush_task = asyncio.create_task(flush_events(event_queue, event_log_fd))
+        logger.info(f"Persisting events to {EVENT_LOG_PATH}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info(f"Service shutting down. Total events logged: {len(events_store)}")
+    if event_flush_task is not None:
+        # Events queued so far are written before the stop marker is reached,
+        # and awaiting the task waits out any write still in its thread
+        event_queue.put_nowait(_FLUSH_STOP)
+        try:
+            await event_flush_task
+        finally:
+            os.close(event_log_fd)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,19 +1,121 @@
 """Response caching layer for Predictive Propositions Service."""
 import hashlib
 import json
-from typing import Optional, Dict, Any, Callable
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, List, Tuple
 from functools import wraps
 import logging
 
 try:
     import redis
+    import redis.asyncio as aioredis
     HAS_REDIS = True
 except ImportError:
     HAS_REDIS = False
 
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    import zstandard as zstd
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+try:
+    from sqlalchemy.orm import Session
+except ImportError:
+    Session = None
+
 logger = logging.getLogger(__name__)
 
+# One-byte tag prefixed to every Redis payload, so the encoding can change
+# without misreading entries written by an older version
+PAYLOAD_RAW = b"\x01"
+PAYLOAD_ZSTD = b"\x02"
+# Smaller payloads are stored uncompressed; zstd gains little on them
+COMPRESS_MIN_BYTES = 256
+ZSTD_LEVEL = 1
+
+
+def _serialize(value: Any) -> bytes:
+    """Encode a value for Redis storage (MessagePack, JSON if unavailable).
+    
+    Payloads above COMPRESS_MIN_BYTES are zstd-compressed when zstandard is
+    installed.
+    """
+    if HAS_MSGPACK:
+        packed = msgpack.packb(value, use_bin_type=True, default=str)
+    else:
+        packed = json.dumps(value, default=str).encode()
+    if HAS_ZSTD and len(packed) > COMPRESS_MIN_BYTES:
+        return PAYLOAD_ZSTD + zstd.compress(packed, ZSTD_LEVEL)
+    return PAYLOAD_RAW + packed
+
+
+def _deserialize(payload: bytes) -> Any:
+    """Decode a value written by _serialize."""
+    tag, packed = payload[:1], payload[1:]
+    if tag == PAYLOAD_ZSTD:
+        packed = zstd.decompress(packed)
+    elif tag != PAYLOAD_RAW:
+        raise ValueError(f"Unknown cache payload version: {tag!r}")
+    if HAS_MSGPACK:
+        return msgpack.unpackb(packed, raw=False)
+    return json.loads(packed)
+
+
+def _build_key(namespace: str, kwargs: Dict[str, Any]) -> str:
+    """Hash namespace and key-value pairs into a cache key."""
+    items = sorted(kwargs.items())
+    if HAS_MSGPACK:
+        payload = msgpack.packb((namespace, items), use_bin_type=True, default=str)
+    else:
+        payload = json.dumps((namespace, items), default=str).encode()
+    key_hash = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    return f"cache:{namespace}:{key_hash}"
+
+
+def _is_key_value(value: Any) -> bool:
+    """Whether an argument takes part in a decorated call's cache key."""
+    # Only injected sessions are skipped; anything else that differs between
+    # calls must reach the key, or distinct calls would share an entry
+    return not (Session is not None and isinstance(value, Session))
+
+
+def _key_value(value: Any) -> Any:
+    """Plain, order-stable representation of a cache-keyed argument."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, dict):
+        return sorted(((_key_value(k), _key_value(v)) for k, v in value.items()), key=repr)
+    if isinstance(value, (set, frozenset)):
+        return sorted((_key_value(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple)):
+        return [_key_value(v) for v in value]
+    return value
+
+
+def _fingerprint(args: tuple, kwargs: Dict[str, Any]) -> bytes:
+    """Serialize the arguments of a decorated call for use as a cache key.
+    
+    Injected SQLAlchemy sessions are left out. Containers are normalized
+    (dicts and sets sorted) and anything msgpack/JSON can't encode natively
+    falls back to str(), so params should have a stable str() if they are
+    not primitives, UUIDs, pydantic models or containers of those.
+    """
+    payload = (
+        [_key_value(a) for a in args if _is_key_value(a)],
+        sorted(((k, _key_value(v)) for k, v in kwargs.items() if _is_key_value(v)), key=lambda kv: kv[0]),
+    )
+    if HAS_MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True, default=str)
+    return json.dumps(payload, default=str).encode()
+
 
 class CacheConfig:
     """Cache configuration."""
@@ -22,7 +124,9 @@ class CacheConfig:
         ttl_seconds: int = 300,
         max_size: int = 10000,
         use_redis: bool = True,
-        redis_url: str = "redis://localhost:6379/0"
+        redis_url: str = "redis://localhost:6379/0",
+        max_connections: int = 64,
+        pool_timeout: float = 2.0
     ):
         """Initialize cache config.
         
@@ -31,11 +135,15 @@ class CacheConfig:
             max_size: Maximum cache size for in-memory cache
             use_redis: Whether to use Redis
             redis_url: Redis connection URL
+            max_connections: Size of each Redis connection pool
+            pool_timeout: Seconds to wait for a free pooled connection
         """
         self.ttl_seconds = ttl_seconds
         self.max_size = max_size
         self.use_redis = use_redis
         self.redis_url = redis_url
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
 
 
 class CacheManager:
@@ -48,18 +156,35 @@ class CacheManager:
             config: CacheConfig instance
         """
         self.config = config or CacheConfig()
-        self.in_memory_cache: Dict[str, Any] = {}
-        self.cache_timestamps: Dict[str, datetime] = {}
+        # key -> (value, monotonic expiry in ns); ordered from least to most recently used
+        self.in_memory_cache: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
         self.redis_client = None
+        # Non-blocking client for coroutine callers; shares the sync client's settings
+        self.aio_redis = None
         
         if self.config.use_redis and HAS_REDIS:
+            # Bounded pools wait for a free connection instead of opening new
+            # ones in bursts; keepalive and health checks retire stale sockets
+            pool_options = dict(
+                max_connections=self.config.max_connections,
+                timeout=self.config.pool_timeout,
+                socket_keepalive=True,
+                health_check_interval=30,
+                decode_responses=False,
+            )
             try:
-                self.redis_client = redis.from_url(self.config.redis_url, decode_responses=True)
+                self.redis_client = redis.Redis(
+                    connection_pool=redis.BlockingConnectionPool.from_url(self.config.redis_url, **pool_options)
+                )
                 self.redis_client.ping()
+                self.aio_redis = aioredis.Redis(
+                    connection_pool=aioredis.BlockingConnectionPool.from_url(self.config.redis_url, **pool_options)
+                )
                 logger.info("Redis cache connected successfully")
             except Exception as e:
                 logger.warning(f"Failed to connect to Redis: {e}. Using in-memory cache.")
                 self.redis_client = None
+                self.aio_redis = None
         elif self.config.use_redis and not HAS_REDIS:
             logger.warning("Redis requested but not installed. Using in-memory cache.")
 
@@ -73,9 +198,7 @@ class CacheManager:
         Returns:
             Cache key
         """
-        key_str = f"{namespace}:{json.dumps(kwargs, sort_keys=True, default=str)}"
-        key_hash = hashlib.md5(key_str.encode()).hexdigest()
-        return f"cache:{namespace}:{key_hash}"
+        return _build_key(namespace, kwargs)
 
     def get(self, namespace: str, **kwargs) -> Optional[Any]:
         """Get value from cache.
@@ -87,32 +210,60 @@ class CacheManager:
         Returns:
             Cached value or None
         """
-        key = self._generate_key(namespace, **kwargs)
-        
+        return self._get_by_key(self._generate_key(namespace, **kwargs), namespace)
+
+    def _get_by_key(self, key: str, namespace: str) -> Optional[Any]:
+        """Get value for an already generated key."""
         # Try Redis first
         if self.redis_client:
             try:
                 value = self.redis_client.get(key)
                 if value:
                     logger.debug(f"Cache hit from Redis: {namespace}")
-                    return json.loads(value)
+                    return _deserialize(value)
             except Exception as e:
                 logger.warning(f"Redis read error: {e}")
         
         # Fall back to in-memory cache
-        if key in self.in_memory_cache:
-            timestamp = self.cache_timestamps.get(key)
-            if timestamp and (datetime.utcnow() - timestamp).total_seconds() < self.config.ttl_seconds:
-                logger.debug(f"Cache hit from memory: {namespace}")
-                return self.in_memory_cache[key]
-            else:
-                # Expired
-                del self.in_memory_cache[key]
-                del self.cache_timestamps[key]
+        value = self._get_local(key)
+        if value is not None:
+            logger.debug(f"Cache hit from memory: {namespace}")
+            return value
         
         logger.debug(f"Cache miss: {namespace}")
         return None
 
+    def get_many(self, namespace: str, keys_kwargs: List[Dict[str, Any]]) -> List[Optional[Any]]:
+        """Get several values from cache in one Redis round-trip.
+        
+        Args:
+            namespace: Cache namespace
+            keys_kwargs: One dict of key-value pairs per lookup
+        
+        Returns:
+            Cached values (None for misses), in the order of keys_kwargs
+        """
+        keys = [self._generate_key(namespace, **kwargs) for kwargs in keys_kwargs]
+        values: List[Optional[Any]] = [None] * len(keys)
+        
+        if self.redis_client and keys:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key in keys:
+                    pipe.get(key)
+                for i, raw in enumerate(pipe.execute()):
+                    if raw:
+                        values[i] = _deserialize(raw)
+            except Exception as e:
+                logger.warning(f"Redis read error: {e}")
+        
+        for i, key in enumerate(keys):
+            if values[i] is None:
+                values[i] = self._get_local(key)
+        
+        logger.debug(f"Cache get_many: {namespace} ({sum(v is not None for v in values)}/{len(keys)} hits)")
+        return values
+
     def set(self, namespace: str, value: Any, **kwargs) -> None:
         """Set value in cache.
         
@@ -121,31 +272,156 @@ class CacheManager:
             value: Value to cache
             **kwargs: Key-value pairs for storage
         """
-        key = self._generate_key(namespace, **kwargs)
-        
+        self._set_by_key(self._generate_key(namespace, **kwargs), namespace, value)
+
+    def _set_by_key(self, key: str, namespace: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Set value for an already generated key, optionally overriding the TTL."""
+        ttl = ttl or self.config.ttl_seconds
         # Store in Redis
         if self.redis_client:
             try:
                 self.redis_client.setex(
                     key,
-                    self.config.ttl_seconds,
-                    json.dumps(value, default=str)
+                    ttl,
+                    _serialize(value)
                 )
                 logger.debug(f"Cached in Redis: {namespace}")
             except Exception as e:
                 logger.warning(f"Redis write error: {e}")
         
         # Always store in in-memory cache
-        if len(self.in_memory_cache) >= self.config.max_size:
-            # Remove oldest entry
-            oldest_key = min(self.cache_timestamps, key=self.cache_timestamps.get)
-            del self.in_memory_cache[oldest_key]
-            del self.cache_timestamps[oldest_key]
-        
-        self.in_memory_cache[key] = value
-        self.cache_timestamps[key] = datetime.utcnow()
+        self._set_local(key, value, ttl)
+        logger.debug(f"Cached in memory: {namespace}")
+
+    def set_many(self, namespace: str, items: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        """Set several values in cache in one Redis round-trip.
+        
+        Args:
+            namespace: Cache namespace
+            items: (value, key-value pairs) tuples to store
+        """
+        entries = [(self._generate_key(namespace, **kwargs), value) for value, kwargs in items]
+        
+        if self.redis_client and entries:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, value in entries:
+                    pipe.setex(key, self.config.ttl_seconds, _serialize(value))
+                pipe.execute()
+                logger.debug(f"Cached {len(entries)} values in Redis: {namespace}")
+            except Exception as e:
+                logger.warning(f"Redis write error: {e}")
+        
+        for key, value in entries:
+            self._set_local(key, value)
+        logger.debug(f"Cached {len(entries)} values in memory: {namespace}")
+
+    async def aget(self, namespace: str, **kwargs) -> Optional[Any]:
+        """Get value from cache without blocking the event loop.
+        
+        Args:
+            namespace: Cache namespace
+            **kwargs: Key-value pairs for lookup
+        
+        Returns:
+            Cached value or None
+        """
+        return await self._aget_by_key(self._generate_key(namespace, **kwargs), namespace)
+
+    async def _aget_by_key(self, key: str, namespace: str) -> Optional[Any]:
+        """Get value for an already generated key without blocking the event loop."""
+        if self.aio_redis:
+            try:
+                value = await self.aio_redis.get(key)
+                if value:
+                    logger.debug(f"Cache hit from Redis: {namespace}")
+                    return _deserialize(value)
+            except Exception as e:
+                logger.warning(f"Redis read error: {e}")
+        
+        value = self._get_local(key)
+        if value is not None:
+            logger.debug(f"Cache hit from memory: {namespace}")
+            return value
+        
+        logger.debug(f"Cache miss: {namespace}")
+        return None
+
+    async def aget_many(self, namespace: str, keys_kwargs: List[Dict[str, Any]]) -> List[Optional[Any]]:
+        """Get several values in one Redis round-trip without blocking the event loop.
+        
+        Args:
+            namespace: Cache namespace
+            keys_kwargs: One dict of key-value pairs per lookup
+        
+        Returns:
+            Cached values (None for misses), in the order of keys_kwargs
+        """
+        keys = [self._generate_key(namespace, **kwargs) for kwargs in keys_kwargs]
+        values: List[Optional[Any]] = [None] * len(keys)
+        
+        if self.aio_redis and keys:
+            try:
+                async with self.aio_redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.get(key)
+                    raw_values = await pipe.execute()
+                for i, raw in enumerate(raw_values):
+                    if raw:
+                        values[i] = _deserialize(raw)
+            except Exception as e:
+                logger.warning(f"Redis read error: {e}")
+        
+        for i, key in enumerate(keys):
+            if values[i] is None:
+                values[i] = self._get_local(key)
+        
+        logger.debug(f"Cache aget_many: {namespace} ({sum(v is not None for v in values)}/{len(keys)} hits)")
+        return values
+
+    async def aset(self, namespace: str, value: Any, **kwargs) -> None:
+        """Set value in cache without blocking the event loop.
+        
+        Args:
+            namespace: Cache namespace
+            value: Value to cache
+            **kwargs: Key-value pairs for storage
+        """
+        await self._aset_by_key(self._generate_key(namespace, **kwargs), namespace, value)
+
+    async def _aset_by_key(self, key: str, namespace: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Set value for an already generated key without blocking the event loop."""
+        ttl = ttl or self.config.ttl_seconds
+        if self.aio_redis:
+            try:
+                await self.aio_redis.setex(key, ttl, _serialize(value))
+                logger.debug(f"Cached in Redis: {namespace}")
+            except Exception as e:
+                logger.warning(f"Redis write error: {e}")
+        
+        self._set_local(key, value, ttl)
         logger.debug(f"Cached in memory: {namespace}")
 
+    def _get_local(self, key: str) -> Optional[Any]:
+        """Look up an unexpired in-memory entry, marking it most recently used."""
+        entry = self.in_memory_cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] > time.monotonic_ns():
+            self.in_memory_cache.move_to_end(key)
+            return entry[0]
+        # Expired
+        del self.in_memory_cache[key]
+        return None
+
+    def _set_local(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Store an in-memory entry, evicting least recently used ones past max_size."""
+        expiry_ns = time.monotonic_ns() + (ttl or self.config.ttl_seconds) * 1_000_000_000
+        self.in_memory_cache[key] = (value, expiry_ns)
+        self.in_memory_cache.move_to_end(key)
+        while len(self.in_memory_cache) > self.config.max_size:
+            self.in_memory_cache.popitem(last=False)
+
     def delete(self, namespace: str, **kwargs) -> None:
         """Delete value from cache.
         
@@ -153,23 +429,43 @@ class CacheManager:
             namespace: Cache namespace
             **kwargs: Key-value pairs for deletion
         """
-        key = self._generate_key(namespace, **kwargs)
-        
+        self._delete_by_key(self._generate_key(namespace, **kwargs))
+
+    def _delete_by_key(self, key: str) -> None:
+        """Delete value for an already generated key."""
         if self.redis_client:
             try:
                 self.redis_client.delete(key)
             except Exception as e:
                 logger.warning(f"Redis delete error: {e}")
         
-        if key in self.in_memory_cache:
-            del self.in_memory_cache[key]
-            del self.cache_timestamps[key]
+        self.in_memory_cache.pop(key, None)
 
-    def clear(self) -> None:
-        """Clear all cache."""
-        self.in_memory_cache.clear()
-        self.cache_timestamps.clear()
-        logger.info("Cache cleared")
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Clear cached entries, in memory and in Redis.
+        
+        Args:
+            namespace: Only clear this namespace (everything if None)
+        """
+        prefix = f"cache:{namespace}:" if namespace else "cache:"
+        if namespace:
+            for key in [k for k in self.in_memory_cache if k.startswith(prefix)]:
+                del self.in_memory_cache[key]
+        else:
+            self.in_memory_cache.clear()
+        
+        if self.redis_client:
+            try:
+                # SCAN instead of KEYS and UNLINK instead of DEL, so neither the
+                # lookup nor the freeing of values blocks Redis
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key in self.redis_client.scan_iter(match=f"{prefix}*", count=1000):
+                    pipe.unlink(key)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Redis clear error: {e}")
+        
+        logger.info(f"Cache cleared: {namespace or 'all namespaces'}")
 
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics.
@@ -188,6 +484,10 @@ class CacheManager:
 def cached(cache_manager: CacheManager, namespace: str, ttl: Optional[int] = None) -> Callable:
     """Decorator to cache function results.
     
+    Keys come from _fingerprint, so injected sessions are ignored. The
+    decorated function gains an ``invalidate(*args, **kwargs)`` attribute
+    that drops the entry cached for those arguments.
+    
     Args:
         cache_manager: CacheManager instance
         namespace: Cache namespace
@@ -196,16 +496,16 @@ def cached(cache_manager: CacheManager, namespace: str, ttl: Optional[int] = Non
     Returns:
         Decorated function
     """
+    def make_key(args: tuple, kwargs: Dict[str, Any]) -> str:
+        return cache_manager._generate_key(namespace, fp=_fingerprint(args, kwargs))
+    
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            cache_key = {
-                "args": str(args),
-                "kwargs": str(kwargs)
-            }
+            cache_key = make_key(args, kwargs)
             
             # Try cache
-            cached_value = cache_manager.get(namespace, **cache_key)
+            cached_value = await cache_manager._aget_by_key(cache_key, namespace)
             if cached_value is not None:
                 return cached_value
             
@@ -213,18 +513,15 @@ def cached(cache_manager: CacheManager, namespace: str, ttl: Optional[int] = Non
             result = await func(*args, **kwargs)
             
             # Store in cache
-            cache_manager.set(namespace, result, **cache_key)
+            await cache_manager._aset_by_key(cache_key, namespace, result, ttl)
             return result
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            cache_key = {
-                "args": str(args),
-                "kwargs": str(kwargs)
-            }
+            cache_key = make_key(args, kwargs)
             
             # Try cache
-            cached_value = cache_manager.get(namespace, **cache_key)
+            cached_value = cache_manager._get_by_key(cache_key, namespace)
             if cached_value is not None:
                 return cached_value
             
@@ -232,14 +529,13 @@ def cached(cache_manager: CacheManager, namespace: str, ttl: Optional[int] = Non
             result = func(*args, **kwargs)
             
             # Store in cache
-            cache_manager.set(namespace, result, **cache_key)
+            cache_manager._set_by_key(cache_key, namespace, result, ttl)
             return result
         
         import inspect
-        if inspect.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        wrapper = async_wrapper if inspect.iscoroutinefunction(func) else sync_wrapper
+        wrapper.invalidate = lambda *args, **kwargs: cache_manager._delete_by_key(make_key(args, kwargs))
+        return wrapper
     
     return decorator
 
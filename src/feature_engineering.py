@@ -1,9 +1,12 @@
 feature_engineering.py"""Feature engineering pipeline for ML model training."""
 import logging
-from typing import List, Dict, Optional, Tuple
+import time
+from typing import Callable, List, Dict, Mapping, Optional, Tuple
 from datetime import datetime, timedelta
-import numpy as np
+import msgpack
+from sqlalchemy import DateTime, bindparam, text
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
 from uuid import UUID
 
 from storage.repositories import (
@@ -13,10 +16,167 @@ from storage.repositories import (
     PropositionRepository,
     FeatureRepository
 )
-from storage.models import UserFeature, Feature
+from storage.models import UserFeature, UserFeatureVector, Feature
 
 logger = logging.getLogger(__name__)
 
+# Feature catalog changes rarely, so name -> id is resolved once per process
+_feature_id_cache: Dict[str, UUID] = {}
+
+# Catalog ordering used for inference vectors: (expires_at, feature names)
+FEATURE_ORDER_TTL = 300.0
+_feature_order_cache: Optional[Tuple[float, List[str]]] = None
+
+
+def _typed_value_columns(value) -> Dict[str, object]:
+    """UserFeature value column for a feature value, chosen by its type."""
+    if isinstance(value, bool):
+        return {"value_bool": value}
+    if isinstance(value, (int, float)):
+        return {"value_num": float(value)}
+    if isinstance(value, datetime):
+        return {"value_ts": value}
+    return {"value_text": str(value)}
+
+
+def _feature_type(value) -> str:
+    """Feature.feature_type for a new definition, matching _typed_value_columns."""
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "numeric"
+    if isinstance(value, datetime):
+        return "temporal"
+    return "text"
+
+
+def _typed_value(value_num, value_text, value_bool, value_ts, value):
+    """Read back the value _typed_value_columns stored, or a legacy text value."""
+    for typed in (value_num, value_bool, value_ts, value_text):
+        if typed is not None:
+            return typed
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def invalidate_feature_order() -> None:
+    """Drop the cached catalog ordering; call after feature definitions change."""
+    global _feature_order_cache
+    _feature_order_cache = None
+
+
+# Everything engineer_all_features needs, one row per user, in a single
+# round-trip: user record, interaction aggregates and proposition stats over
+# the lookback window. Each table is scanned once via its user_id index.
+FEATURE_INPUTS_SQL = text("""
+    WITH target AS (
+        SELECT id, created_at, is_active, updated_at
+        FROM users
+        WHERE id = ANY(:user_ids)
+    ),
+    interaction_groups AS (
+        SELECT user_id, interaction_type,
+               COUNT(*) AS n,
+               SUM(NULLIF(duration_seconds, 0)) AS duration_sum,
+               COUNT(NULLIF(duration_seconds, 0)) AS duration_count,
+               MIN(created_at) AS first_at,
+               MAX(created_at) AS last_at
+        FROM interactions
+        WHERE user_id = ANY(:user_ids) AND created_at >= :cutoff
+        GROUP BY user_id, interaction_type
+    ),
+    interaction_stats AS (
+        SELECT user_id,
+               jsonb_object_agg(interaction_type, n) AS interaction_counts,
+               COALESCE(SUM(duration_sum), 0)::float8 AS duration_sum,
+               SUM(duration_count)::bigint AS duration_count,
+               MIN(first_at) AS first_interaction_at,
+               MAX(last_at) AS last_interaction_at
+        FROM interaction_groups
+        GROUP BY user_id
+    ),
+    proposition_groups AS (
+        SELECT user_id, proposition_type, status,
+               COUNT(*) AS n,
+               SUM(confidence_score) AS confidence_sum,
+               MAX(confidence_score) AS confidence_max
+        FROM propositions
+        WHERE user_id = ANY(:user_ids) AND created_at >= :cutoff
+        GROUP BY user_id, proposition_type, status
+    ),
+    proposition_stats AS (
+        SELECT user_id,
+               SUM(n)::bigint AS proposition_count,
+               SUM(confidence_sum) / SUM(n) AS avg_confidence,
+               MAX(confidence_max) AS max_confidence,
+               COALESCE(SUM(n) FILTER (WHERE status = 'pending'), 0)::bigint AS pending_count,
+               COALESCE(SUM(n) FILTER (WHERE status = 'accepted'), 0)::bigint AS accepted_count,
+               COALESCE(SUM(n) FILTER (WHERE status = 'rejected'), 0)::bigint AS rejected_count
+        FROM proposition_groups
+        GROUP BY user_id
+    ),
+    proposition_types AS (
+        SELECT user_id, jsonb_object_agg(proposition_type, n) AS proposition_types
+        FROM (
+            SELECT user_id, proposition_type, SUM(n)::bigint AS n
+            FROM proposition_groups
+            GROUP BY user_id, proposition_type
+        ) by_type
+        GROUP BY user_id
+    )
+    SELECT t.id AS user_id, t.created_at, t.is_active, t.updated_at,
+           i.interaction_counts, i.duration_sum, i.duration_count,
+           i.first_interaction_at, i.last_interaction_at,
+           p.proposition_count, p.avg_confidence, p.max_confidence,
+           p.pending_count, p.accepted_count, p.rejected_count,
+           pt.proposition_types
+    FROM target t
+    LEFT JOIN interaction_stats i ON i.user_id = t.id
+    LEFT JOIN proposition_stats p ON p.user_id = t.id
+    LEFT JOIN proposition_types pt ON pt.user_id = t.id
+""").bindparams(
+    bindparam("user_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("cutoff", type_=DateTime()),
+).columns(user_id=PG_UUID(as_uuid=True))
+
+
+def _keep(value: float) -> float:
+    """Already normalized (0-1)."""
+    return value
+
+
+# (name substring, normalizer) checked in order; first match wins
+NORMALIZERS: Tuple[Tuple[str, Callable[[float], float]], ...] = (
+    ("rate", _keep),
+    ("days", lambda value: min(value / 365, 1.0)),  # Normalize days (0-365)
+    ("count", lambda value: min(value / 100, 1.0)),  # Normalize counts (0-100)
+    ("confidence", _keep),
+)
+
+
+def _default_normalizer(value: float) -> float:
+    """Default: min-max normalization."""
+    return min(value / max(value, 1), 1.0)
+
+
+_normalizer_by_name: Dict[str, Callable[[float], float]] = {}
+
+
+def _normalizer_for(name: str) -> Callable[[float], float]:
+    """Return the normalizer for a feature name, matching its substrings only once."""
+    normalizer = _normalizer_by_name.get(name)
+    if normalizer is None:
+        lowered = name.lower()
+        normalizer = next(
+            (fn for token, fn in NORMALIZERS if token in lowered), _default_normalizer
+        )
+        _normalizer_by_name[name] = normalizer
+    return normalizer
+
 
 class FeatureEngineer:
     """Handles feature engineering for ML model training."""
@@ -43,39 +203,72 @@ class FeatureEngineer:
             user_id: User ID to engineer features for
             
         Returns:
-            Dictionary of feature_name: feature_value
+            Dictionary of feature_name: feature_value (empty if the user doesn't exist)
         """
         logger.info(f"Engineering features for user {user_id}")
         
-        features = {}
         cutoff_date = datetime.utcnow() - timedelta(days=self.lookback_days)
         
+        # Only one user is queried, so its row is the only one
+        inputs = next(iter(self._fetch_feature_inputs([user_id], cutoff_date).values()), None)
+        if inputs is None:
+            logger.warning(f"User {user_id} not found; no features engineered")
+            return {}
+        
+        features = self._build_features(inputs)
+        
+        logger.info(f"Engineered {len(features)} features for user {user_id}")
+        return features
+    
+    def _fetch_feature_inputs(self, user_ids: List[UUID], cutoff_date: datetime) -> Dict[UUID, Mapping]:
+        """Fetch every aggregate the features need in a single round-trip.
+        
+        Args:
+            user_ids: Users to fetch inputs for
+            cutoff_date: Start of the lookback window
+            
+        Returns:
+            Dictionary of user_id: row of FEATURE_INPUTS_SQL columns; users that
+            don't exist are omitted
+        """
+        if not user_ids:
+            return {}
+        result = self.db.execute(FEATURE_INPUTS_SQL, {"user_ids": user_ids, "cutoff": cutoff_date})
+        return {row["user_id"]: row for row in result.mappings()}
+    
+    def _build_features(self, inputs: Mapping) -> Dict[str, float]:
+        """Assemble the full feature dict from a row of pre-aggregated inputs.
+        
+        Args:
+            inputs: Row returned by _fetch_feature_inputs
+            
+        Returns:
+            Dictionary of feature_name: feature_value
+        """
+        features = {}
+        
         # User engagement features
-        features.update(self._engineer_engagement_features(user_id, cutoff_date))
+        features.update(self._engineer_engagement_features(inputs))
         
         # Interaction pattern features
-        features.update(self._engineer_interaction_features(user_id, cutoff_date))
+        features.update(self._engineer_interaction_features(inputs))
         
         # Proposition response features
-        features.update(self._engineer_proposition_features(user_id, cutoff_date))
+        features.update(self._engineer_proposition_features(inputs))
         
         # Temporal features
-        features.update(self._engineer_temporal_features(user_id))
+        features.update(self._engineer_temporal_features(inputs))
         
-        logger.info(f"Engineered {len(features)} features for user {user_id}")
         return features
     
-    def _engineer_engagement_features(self, user_id: UUID, cutoff_date: datetime) -> Dict[str, float]:
-        """Engineer user engagement features."""
-        interactions = self.interaction_repo.get_interactions_by_user(
-            user_id, after_date=cutoff_date
-        )
-        
-        total_interactions = len(interactions)
-        click_count = sum(1 for i in interactions if i.interaction_type == 'click')
-        hover_count = sum(1 for i in interactions if i.interaction_type == 'hover')
-        accept_count = sum(1 for i in interactions if i.interaction_type == 'accept')
-        reject_count = sum(1 for i in interactions if i.interaction_type == 'reject')
+    def _engineer_engagement_features(self, inputs: Mapping) -> Dict[str, float]:
+        """Engineer user engagement features from per-type interaction counts."""
+        counts = inputs["interaction_counts"] or {}
+        total_interactions = sum(counts.values())
+        click_count = counts.get('click', 0)
+        hover_count = counts.get('hover', 0)
+        accept_count = counts.get('accept', 0)
+        reject_count = counts.get('reject', 0)
         
         # Calculate engagement rates
         engagement_rate = click_count / total_interactions if total_interactions > 0 else 0
@@ -83,8 +276,8 @@ class FeatureEngineer:
         rejection_rate = reject_count / total_interactions if total_interactions > 0 else 0
         
         # Calculate average interaction duration
-        durations = [i.duration_seconds for i in interactions if i.duration_seconds]
-        avg_duration = np.mean(durations) if durations else 0
+        duration_n = inputs["duration_count"] or 0
+        avg_duration = inputs["duration_sum"] / duration_n if duration_n else 0
         
         return {
             "total_interactions": float(total_interactions),
@@ -98,72 +291,49 @@ class FeatureEngineer:
             "avg_interaction_duration": float(avg_duration)
         }
     
-    def _engineer_interaction_features(self, user_id: UUID, cutoff_date: datetime) -> Dict[str, float]:
-        """Engineer interaction pattern features."""
-        interactions = self.interaction_repo.get_interactions_by_user(
-            user_id, after_date=cutoff_date
-        )
+    def _engineer_interaction_features(self, inputs: Mapping) -> Dict[str, float]:
+        """Engineer interaction pattern features from per-type interaction counts."""
+        counts = inputs["interaction_counts"] or {}
         
         # Calculate interaction frequency
-        if interactions:
-            date_range = (interactions[-1].created_at - interactions[0].created_at).days + 1
-            interaction_frequency = len(interactions) / max(date_range, 1)
+        if counts:
+            date_range = (inputs["last_interaction_at"] - inputs["first_interaction_at"]).days + 1
+            interaction_frequency = sum(counts.values()) / max(date_range, 1)
         else:
             interaction_frequency = 0
         
         # Calculate interaction diversity
-        interaction_types = set(i.interaction_type for i in interactions)
-        interaction_diversity = len(interaction_types) / 5  # Normalize by max types
+        interaction_diversity = len(counts) / 5  # Normalize by max types
         
         return {
             "interaction_frequency": float(interaction_frequency),
             "interaction_diversity": float(interaction_diversity),
-            "unique_interaction_types": float(len(interaction_types))
+            "unique_interaction_types": float(len(counts))
         }
     
-    def _engineer_proposition_features(self, user_id: UUID, cutoff_date: datetime) -> Dict[str, float]:
-        """Engineer proposition response features."""
-        propositions = self.proposition_repo.get_propositions_by_user(user_id)
-        recent_props = [p for p in propositions if p.created_at >= cutoff_date]
-        
-        # Calculate proposition response statistics
-        avg_confidence = np.mean([p.confidence_score for p in recent_props]) if recent_props else 0
-        max_confidence = max([p.confidence_score for p in recent_props]) if recent_props else 0
-        
-        # Proposition status distribution
-        pending = sum(1 for p in recent_props if p.status == 'pending')
-        accepted = sum(1 for p in recent_props if p.status == 'accepted')
-        rejected = sum(1 for p in recent_props if p.status == 'rejected')
-        
-        # Proposition type distribution
-        prop_types = {}
-        for p in recent_props:
-            prop_type = p.proposition_type
-            prop_types[f"type_{prop_type}"] = prop_types.get(f"type_{prop_type}", 0) + 1
+    def _engineer_proposition_features(self, inputs: Mapping) -> Dict[str, float]:
+        """Engineer proposition response features from the lookback window's proposition stats."""
+        prop_types = inputs["proposition_types"] or {}
         
         return {
-            "avg_proposition_confidence": float(avg_confidence),
-            "max_proposition_confidence": float(max_confidence),
-            "pending_propositions": float(pending),
-            "accepted_propositions": float(accepted),
-            "rejected_propositions": float(rejected),
-            "total_propositions": float(len(recent_props)),
-            **{k: float(v) for k, v in prop_types.items()}
+            "avg_proposition_confidence": float(inputs["avg_confidence"] or 0),
+            "max_proposition_confidence": float(inputs["max_confidence"] or 0),
+            "pending_propositions": float(inputs["pending_count"] or 0),
+            "accepted_propositions": float(inputs["accepted_count"] or 0),
+            "rejected_propositions": float(inputs["rejected_count"] or 0),
+            "total_propositions": float(inputs["proposition_count"] or 0),
+            **{f"type_{k}": float(v) for k, v in prop_types.items()}
         }
     
-    def _engineer_temporal_features(self, user_id: UUID) -> Dict[str, float]:
+    def _engineer_temporal_features(self, inputs: Mapping) -> Dict[str, float]:
         """Engineer temporal features."""
-        user = self.user_repo.read(user_id)
-        if not user:
-            return {}
-        
         now = datetime.utcnow()
-        account_age_days = (now - user.created_at).days
+        account_age_days = (now - inputs["created_at"]).days
         
         return {
             "account_age_days": float(account_age_days),
-            "is_active": float(user.is_active),
-            "days_since_last_update": float((now - user.updated_at).days)
+            "is_active": float(inputs["is_active"]),
+            "days_since_last_update": float((now - inputs["updated_at"]).days)
         }
     
     def store_features(self, user_id: UUID, features: Dict[str, float]) -> None:
@@ -175,24 +345,86 @@ class FeatureEngineer:
         """
         logger.info(f"Storing {len(features)} features for user {user_id}")
         
-        for feature_name, feature_value in features.items():
-            # Get or create feature definition
-            feature = self.feature_repo.get_by_name(feature_name)
-            if not feature:
-                feature = self.feature_repo.create({
-                    "name": feature_name,
-                    "feature_type": "numeric",
-                    "description": f"Feature: {feature_name}",
+        if not features:
+            return
+        
+        try:
+            feature_ids = self._resolve_feature_ids(features)
+            
+            # One multi-row INSERT for all values instead of a commit per feature
+            now = datetime.utcnow()
+            self.db.bulk_insert_mappings(UserFeature, [
+                {
+                    "user_id": user_id,
+                    "feature_id": feature_ids[feature_name],
+                    "timestamp": now,
+                    **_typed_value_columns(feature_value)
+                }
+                for feature_name, feature_value in features.items()
+            ])
+            
+            # Latest values as one blob per user, so serving reads a single row
+            vector_stmt = pg_insert(UserFeatureVector).values(
+                user_id=user_id,
+                vector=msgpack.packb(features, use_bin_type=True),
+                updated_at=now
+            )
+            self.db.execute(vector_stmt.on_conflict_do_update(
+                index_elements=[UserFeatureVector.user_id],
+                set_={
+                    "vector": vector_stmt.excluded.vector,
+                    "updated_at": vector_stmt.excluded.updated_at
+                }
+            ))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            # A cached id may point at a deleted definition; re-resolve next time
+            _feature_id_cache.clear()
+            logger.error(f"Error storing features for user {user_id}: {str(e)}")
+            raise
+    
+    def _resolve_feature_ids(self, features: Mapping[str, object]) -> Dict[str, UUID]:
+        """Map feature names to ids, creating missing definitions in one statement.
+        
+        Args:
+            features: Dictionary of feature_name: feature_value; a missing
+                definition gets its feature_type from the value
+            
+        Returns:
+            Dictionary of feature_name: feature_id
+        """
+        names = list(features)
+        feature_ids = {name: _feature_id_cache[name] for name in names if name in _feature_id_cache}
+        uncached = [name for name in names if name not in feature_ids]
+        if not uncached:
+            return feature_ids
+        
+        feature_ids.update(
+            self.db.query(Feature.name, Feature.id).filter(Feature.name.in_(uncached)).all()
+        )
+        missing = [name for name in uncached if name not in feature_ids]
+        if missing:
+            stmt = pg_insert(Feature).values([
+                {
+                    "name": name,
+                    "feature_type": _feature_type(features[name]),
+                    "description": f"Feature: {name}",
                     "is_active": True
-                })
+                }
+                for name in missing
+            ]).on_conflict_do_nothing(index_elements=[Feature.name]).returning(Feature.name, Feature.id)
+            feature_ids.update(self.db.execute(stmt).all())
             
-            # Store user feature value
-            self.user_feature_repo.create({
-                "user_id": user_id,
-                "feature_id": feature.id,
-                "value": str(feature_value),
-                "timestamp": datetime.utcnow()
-            })
+            # Rows skipped by ON CONFLICT were created concurrently; read their ids back
+            still_missing = [name for name in missing if name not in feature_ids]
+            if still_missing:
+                feature_ids.update(
+                    self.db.query(Feature.name, Feature.id).filter(Feature.name.in_(still_missing)).all()
+                )
+            invalidate_feature_order()
+        _feature_id_cache.update(feature_ids)
+        return feature_ids
     
     def get_training_data(self, limit: int = 1000) -> Tuple[List[Dict], List[float]]:
         """Get feature vectors and labels for model training.
@@ -206,16 +438,28 @@ class FeatureEngineer:
         logger.info(f"Preparing training data for {limit} users")
         
         users = self.user_repo.read_all(limit=limit)
+        user_ids = [user.id for user in users]
+        cutoff_date = datetime.utcnow() - timedelta(days=self.lookback_days)
+        
+        # Fetch inputs for every user up front: a fixed number of grouped queries
+        # instead of several round-trips per user
+        window_inputs = self._fetch_feature_inputs(user_ids, cutoff_date)
+        lifetime_aggregates = self.interaction_repo.aggregate_by_users(user_ids)
+        
         X = []  # Feature vectors
         y = []  # Labels (acceptance rate)
         
         for user in users:
-            features = self.engineer_all_features(user.id)
-            interactions = self.interaction_repo.get_interactions_by_user(user.id)
+            inputs = window_inputs.get(user.id)
+            if inputs is None:
+                continue  # Deleted since the user list was read
+            features = self._build_features(inputs)
+            lifetime = lifetime_aggregates.get(user.id)
             
-            if interactions:
-                accept_count = sum(1 for i in interactions if i.interaction_type == 'accept')
-                label = accept_count / len(interactions)  # Acceptance rate
+            if lifetime:
+                total = sum(agg["count"] for agg in lifetime.values())
+                accept_count = lifetime["accept"]["count"] if "accept" in lifetime else 0
+                label = accept_count / total  # Acceptance rate
             else:
                 label = 0.5  # Default label
             
@@ -234,26 +478,7 @@ class FeatureEngineer:
         Returns:
             Dictionary of normalized features
         """
-        normalized = {}
-        
-        for name, value in features.items():
-            if "rate" in name.lower():
-                # Already normalized (0-1)
-                normalized[name] = value
-            elif "days" in name.lower():
-                # Normalize days (0-365)
-                normalized[name] = min(value / 365, 1.0)
-            elif "count" in name.lower():
-                # Normalize counts (0-100)
-                normalized[name] = min(value / 100, 1.0)
-            elif "confidence" in name.lower():
-                # Already normalized (0-1)
-                normalized[name] = value
-            else:
-                # Default: min-max normalization
-                normalized[name] = min(value / max(value, 1), 1.0)
-        
-        return normalized
+        return {name: _normalizer_for(name)(value) for name, value in features.items()}
 
 
 class FeatureStore:
@@ -278,16 +503,40 @@ class FeatureStore:
         Returns:
             Dictionary of feature_name: feature_value
         """
-        user_features = self.user_feature_repo.get_user_features(user_id)
-        
-        features = {}
-        for uf in user_features:
-            try:
-                features[uf.feature.name] = float(uf.value)
-            except (ValueError, AttributeError) as e:
-                logger.error(f"Error parsing feature {uf.feature.name}: {str(e)}")
+        row = self.db.get(UserFeatureVector, user_id)
+        if row is None:
+            # Stored before feature vectors existed; rebuild from the history
+            return self._latest_user_features(user_id)
+        
+        try:
+            return msgpack.unpackb(row.vector, raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            logger.error(f"Error decoding feature vector for user {user_id}: {str(e)}")
+            return self._latest_user_features(user_id)
+    
+    def _latest_user_features(self, user_id: UUID) -> Dict[str, float]:
+        """Latest value of each feature from the UserFeature history.
         
-        return features
+        Args:
+            user_id: User ID
+            
+        Returns:
+            Dictionary of feature_name: feature_value
+        """
+        # DISTINCT ON walks idx_user_feature_time, newest row per feature first
+        rows = self.db.query(
+            Feature.name,
+            UserFeature.value_num,
+            UserFeature.value_text,
+            UserFeature.value_bool,
+            UserFeature.value_ts,
+            UserFeature.value
+        ).join(Feature, UserFeature.feature_id == Feature.id).filter(
+            UserFeature.user_id == user_id
+        ).distinct(UserFeature.feature_id).order_by(
+            UserFeature.feature_id, UserFeature.timestamp.desc(), UserFeature.id.desc()
+        ).all()
+        return {name: _typed_value(*values) for name, *values in rows}
     
     def get_feature_vector(self, user_id: UUID) -> List[float]:
         """Get feature vector for a user (for model inference).
@@ -299,8 +548,15 @@ class FeatureStore:
             List of feature values
         """
         features = self.get_user_features(user_id)
-        all_features = self.feature_repo.read_all()
         
         # Create vector in consistent order
-        vector = [features.get(f.name, 0.0) for f in all_features]
-        return vector
+        return [features.get(name, 0.0) for name in self._feature_order()]
+    
+    def _feature_order(self) -> List[str]:
+        """Feature names in vector order, cached for FEATURE_ORDER_TTL seconds."""
+        global _feature_order_cache
+        now = time.monotonic()
+        if _feature_order_cache is None or _feature_order_cache[0] <= now:
+            names = [name for (name,) in self.db.query(Feature.name).order_by(Feature.id)]
+            _feature_order_cache = (now + FEATURE_ORDER_TTL, names)
+        return _feature_order_cache[1]
@@ -7,7 +7,7 @@ from uuid import UUID
 from datetime import datetime
 import logging
 
-from storage.database import get_db, init_db
+from storage.database import get_db, get_uow, init_db, UnitOfWork
 from storage.repositories import (
     UserRepository,
     PropositionRepository,
@@ -16,8 +16,10 @@ from storage.repositories import (
 )
 from storage.models import (
     User, Proposition, Interaction, Feature,
-    PropositionType
+    PropositionType, PropositionStatus, InteractionType
 )
+from feature_engineering import invalidate_feature_order
+from caching import cached, default_cache_manager
 
 logger = logging.getLogger(__name__)
 
@@ -59,70 +61,117 @@ async def health_check():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+# Pagination bounds are checked by hand rather than with Query(ge=..., le=...)
+# validators, which cost an extra validation step on every request
+MAX_PAGE_SIZE = 100
+
+def _check_paging(skip: int, limit: int) -> None:
+    """Reject out-of-range pagination parameters."""
+    if skip < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"skip must be >= 0 and limit between 1 and {MAX_PAGE_SIZE}"
+        )
+
+def _parse_cursor(created_at: Optional[datetime], id: Optional[UUID]) -> Optional[tuple]:
+    """Keyset cursor from its query parameters; both or neither must be given."""
+    if created_at is None and id is None:
+        return None
+    if created_at is None or id is None:
+        raise HTTPException(
+            status_code=422,
+            detail="cursor_created_at and cursor_id must be given together"
+        )
+    return (created_at, id)
+
+def _format_cursor(cursor: Optional[tuple]) -> Optional[dict]:
+    """Query parameters that fetch the page after the one ending at cursor."""
+    if cursor is None:
+        return None
+    created_at, id = cursor
+    return {"cursor_created_at": created_at, "cursor_id": id}
+
 # ============== USER ENDPOINTS ==============
 
 @app.get("/api/v1/users/{user_id}")
+@cached(default_cache_manager, "user", ttl=60)
 async def get_user(user_id: UUID, db: Session = Depends(get_db)):
     """Retrieve a user by ID."""
     repo = UserRepository(db)
     user = repo.read(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    # Plain column values so the cached copy survives the session and Redis
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
 
 @app.get("/api/v1/users")
 async def list_users(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100),
-    active_only: bool = Query(False),
+    skip: int = 0,
+    limit: int = 10,
+    active_only: bool = False,
+    cursor_created_at: Optional[datetime] = None,
+    cursor_id: Optional[UUID] = None,
     db: Session = Depends(get_db)
 ):
-    """List users with pagination."""
+    """List users with pagination, newest first.
+    
+    Pass the next_cursor of the previous page as cursor_created_at and
+    cursor_id to page by keyset; skip is deprecated.
+    """
+    _check_paging(skip, limit)
+    cursor = _parse_cursor(cursor_created_at, cursor_id)
     repo = UserRepository(db)
     if active_only:
-        users = repo.get_active_users(skip=skip, limit=limit)
-    else:
+        users = repo.get_active_users(skip=skip, limit=limit, cursor=cursor)
+    elif skip and cursor is None:
         users = repo.read_all(skip=skip, limit=limit)
-    return {"items": users, "total": repo.count()}
+    else:
+        users = repo.paginate(cursor, limit)
+    return {"items": users, "total": repo.count(), "next_cursor": _format_cursor(repo.next_cursor(users))}
 
 @app.post("/api/v1/users")
 async def create_user(
     username: str,
     email: str,
-    db: Session = Depends(get_db)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     """Create a new user."""
-    repo = UserRepository(db)
+    repo = UserRepository(uow.db)
     
     # Check if user already exists
-    if repo.get_by_username(username):
+    if repo.exists_by(username=username):
         raise HTTPException(status_code=400, detail="Username already exists")
-    if repo.get_by_email(email):
+    if repo.exists_by(email=email):
         raise HTTPException(status_code=400, detail="Email already exists")
     
-    user = repo.create({
-        "username": username,
-        "email": email,
-        "is_active": True
-    })
+    with uow.transaction():
+        user = repo.create({
+            "username": username,
+            "email": email,
+            "is_active": True
+        })
     return user
 
 @app.put("/api/v1/users/{user_id}/deactivate")
-async def deactivate_user(user_id: UUID, db: Session = Depends(get_db)):
+async def deactivate_user(user_id: UUID, uow: UnitOfWork = Depends(get_uow)):
     """Deactivate a user account."""
-    repo = UserRepository(db)
-    success = repo.deactivate_user(user_id)
+    repo = UserRepository(uow.db)
+    with uow.transaction():
+        success = repo.deactivate_user(user_id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
+    get_user.invalidate(user_id=user_id)
     return {"status": "deactivated", "user_id": user_id}
 
 @app.put("/api/v1/users/{user_id}/reactivate")
-async def reactivate_user(user_id: UUID, db: Session = Depends(get_db)):
+async def reactivate_user(user_id: UUID, uow: UnitOfWork = Depends(get_uow)):
     """Reactivate a user account."""
-    repo = UserRepository(db)
-    success = repo.reactivate_user(user_id)
+    repo = UserRepository(uow.db)
+    with uow.transaction():
+        success = repo.reactivate_user(user_id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
+    get_user.invalidate(user_id=user_id)
     return {"status": "reactivated", "user_id": user_id}
 
 @app.get("/api/v1/users/search")
@@ -139,27 +188,32 @@ async def search_users(
 # ============== PROPOSITION ENDPOINTS ==============
 
 @app.get("/api/v1/propositions/{proposition_id}")
+@cached(default_cache_manager, "proposition", ttl=60)
 async def get_proposition(proposition_id: UUID, db: Session = Depends(get_db)):
     """Retrieve a proposition by ID."""
     repo = PropositionRepository(db)
     prop = repo.read(proposition_id)
     if not prop:
         raise HTTPException(status_code=404, detail="Proposition not found")
-    return prop
+    # Plain column values so the cached copy survives the session and Redis.
+    # No endpoint here modifies an existing proposition; if one is added (e.g.
+    # a status change), call get_proposition.invalidate(proposition_id=...)
+    return {column.key: getattr(prop, column.key) for column in Proposition.__table__.columns}
 
 @app.get("/api/v1/users/{user_id}/propositions")
 async def get_user_propositions(
     user_id: UUID,
-    status_filter: Optional[str] = Query(None),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100),
+    status_filter: Optional[PropositionStatus] = None,
+    skip: int = 0,
+    limit: int = 10,
     db: Session = Depends(get_db)
 ):
     """Get propositions for a specific user."""
+    _check_paging(skip, limit)
     repo = PropositionRepository(db)
-    props = repo.get_propositions_by_user(user_id, skip=skip, limit=limit)
-    if status_filter:
-        props = [p for p in props if p.status == status_filter]
+    props = repo.get_propositions_by_user(
+        user_id, skip=skip, limit=limit, status=status_filter
+    )
     return {"user_id": user_id, "propositions": props}
 
 @app.post("/api/v1/propositions")
@@ -169,23 +223,24 @@ async def create_proposition(
     title: str,
     description: str,
     confidence_score: float = Query(..., ge=0.0, le=1.0),
-    db: Session = Depends(get_db)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     """Create a new proposition for a user."""
     # Verify user exists
-    user_repo = UserRepository(db)
+    user_repo = UserRepository(uow.db)
     if not user_repo.exists(user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
-    repo = PropositionRepository(db)
-    prop = repo.create({
-        "user_id": user_id,
-        "proposition_type": proposition_type,
-        "title": title,
-        "description": description,
-        "confidence_score": confidence_score,
-        "status": "pending"
-    })
+    repo = PropositionRepository(uow.db)
+    with uow.transaction():
+        prop = repo.create({
+            "user_id": user_id,
+            "proposition_type": proposition_type,
+            "title": title,
+            "description": description,
+            "confidence_score": confidence_score,
+            "status": "pending"
+        })
     return prop
 
 # ============== INTERACTION ENDPOINTS ==============
@@ -194,28 +249,30 @@ async def create_proposition(
 async def record_interaction(
     user_id: UUID,
     proposition_id: UUID,
-    interaction_type: str,
+    interaction_type: InteractionType,
     duration_seconds: Optional[int] = None,
-    db: Session = Depends(get_db)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     """Record a user interaction with a proposition."""
-    repo = InteractionRepository(db)
-    interaction = repo.create({
-        "user_id": user_id,
-        "proposition_id": proposition_id,
-        "interaction_type": interaction_type,
-        "duration_seconds": duration_seconds
-    })
+    repo = InteractionRepository(uow.db)
+    with uow.transaction():
+        interaction = repo.create({
+            "user_id": user_id,
+            "proposition_id": proposition_id,
+            "interaction_type": interaction_type,
+            "duration_seconds": duration_seconds
+        })
     return interaction
 
 @app.get("/api/v1/propositions/{proposition_id}/interactions")
 async def get_proposition_interactions(
     proposition_id: UUID,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100),
+    skip: int = 0,
+    limit: int = 10,
     db: Session = Depends(get_db)
 ):
     """Get all interactions for a proposition."""
+    _check_paging(skip, limit)
     repo = InteractionRepository(db)
     interactions = repo.get_interactions_by_proposition(proposition_id, skip=skip, limit=limit)
     return {"proposition_id": proposition_id, "interactions": interactions}
@@ -224,36 +281,53 @@ async def get_proposition_interactions(
 
 @app.get("/api/v1/features")
 async def list_features(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100),
+    skip: int = 0,
+    limit: int = 10,
+    cursor_created_at: Optional[datetime] = None,
+    cursor_id: Optional[UUID] = None,
     db: Session = Depends(get_db)
 ):
-    """List all ML features."""
+    """List all ML features, newest first.
+    
+    Pass the next_cursor of the previous page as cursor_created_at and
+    cursor_id to page by keyset; skip is deprecated.
+    """
+    _check_paging(skip, limit)
+    cursor = _parse_cursor(cursor_created_at, cursor_id)
     repo = FeatureRepository(db)
-    features = repo.read_all(skip=skip, limit=limit)
-    return {"features": features, "total": repo.count()}
+    if skip and cursor is None:
+        features = repo.read_all(skip=skip, limit=limit)
+    else:
+        features = repo.paginate(cursor, limit)
+    return {
+        "features": features,
+        "total": repo.count(),
+        "next_cursor": _format_cursor(repo.next_cursor(features))
+    }
 
 @app.post("/api/v1/features")
 async def create_feature(
     name: str,
     feature_type: str,
     description: Optional[str] = None,
-    db: Session = Depends(get_db)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     """Create a new ML feature."""
-    repo = FeatureRepository(db)
-    feature = repo.create({
-        "name": name,
-        "feature_type": feature_type,
-        "description": description,
-        "is_active": True
-    })
+    repo = FeatureRepository(uow.db)
+    with uow.transaction():
+        feature = repo.create({
+            "name": name,
+            "feature_type": feature_type,
+            "description": description,
+            "is_active": True
+        })
+    invalidate_feature_order()
     return feature
 
 # ============== ANALYTICS ENDPOINTS ==============
 
 @app.get("/api/v1/analytics/user-count")
-async def get_user_count(active_only: bool = Query(False), db: Session = Depends(get_db)):
+async def get_user_count(active_only: bool = False, db: Session = Depends(get_db)):
     """Get total user count."""
     repo = UserRepository(db)
     if active_only:
@@ -264,19 +338,17 @@ async def get_user_count(active_only: bool = Query(False), db: Session = Depends
         return {"total_users": count}
 
 @app.get("/api/v1/analytics/proposition-stats")
+@cached(default_cache_manager, "proposition_stats", ttl=10)
 async def get_proposition_stats(db: Session = Depends(get_db)):
     """Get proposition statistics."""
     repo = PropositionRepository(db)
-    total = repo.count()
-    pending = repo.count({"status": "pending"})
-    accepted = repo.count({"status": "accepted"})
-    rejected = repo.count({"status": "rejected"})
+    stats = repo.count_by_status()
     
     return {
-        "total_propositions": total,
-        "pending": pending,
-        "accepted": accepted,
-        "rejected": rejected
+        "total_propositions": sum(stats.values()),
+        "pending": stats["pending"],
+        "accepted": stats["accepted"],
+        "rejected": stats["rejected"]
     }
 
 # ============== ERROR HANDLERS ==============
@@ -1,5 +1,9 @@
 ml_training.py"""ML model training and ranking engine for Predictive Propositions Service."""
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 import joblib
 import numpy as np
 from typing import Dict, List, Tuple, Optional
@@ -13,6 +17,13 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import xgboost as xgb
 
+try:
+    import treelite
+    import tl2cgen
+except ImportError:
+    treelite = None
+    tl2cgen = None
+
 from sqlalchemy.orm import Session
 from storage.repositories import (
     FeatureRepository,
@@ -24,23 +35,33 @@ from feature_engineering import FeatureEngineer
 
 logger = logging.getLogger(__name__)
 
+# Split-on-threshold models are invariant to per-feature scaling, so they skip
+# the StandardScaler pass on both training and every prediction
+TREE_MODEL_TYPES = ("xgboost", "random_forest", "gradient_boosting")
+
 
 class MLModelTrainer:
     """Handles ML model training and evaluation."""
     
-    def __init__(self, db: Session, model_type: str = "xgboost"):
+    def __init__(self, db: Session, model_type: str = "xgboost", serving_nthread: int = 1):
         """Initialize ML trainer.
         
         Args:
             db: SQLAlchemy session
             model_type: Type of model - 'xgboost', 'random_forest', 'gradient_boosting'
+            serving_nthread: Threads used for predictions by loaded models
         """
         self.db = db
         self.model_type = model_type
+        self.serving_nthread = serving_nthread
         self.model = None
-        self.scaler = StandardScaler()
+        self.scaler = None if model_type in TREE_MODEL_TYPES else StandardScaler()
         self.feature_names = []
         self.model_version = None
+        # Treelite-compiled predictor for xgboost models, when one was exported
+        self._tl_predictor = None
+        # Feature importances sorted descending, fixed once a model is trained or loaded
+        self._importances_sorted: Optional[Dict[str, float]] = None
         self.feature_engineer = FeatureEngineer(db)
         self.feature_repo = FeatureRepository(db)
     
@@ -62,9 +83,14 @@ class MLModelTrainer:
             feature_names = list(X[0].keys())
             self.feature_names = feature_names
             
-            # Convert to numpy array
-            X_array = np.array([list(sample.values()) for sample in X])
-            y_array = np.array(y)
+            # Fill a preallocated float32 matrix column by column, looking values
+            # up by name so samples with differently ordered keys stay aligned
+            X_array = np.empty((len(X), len(feature_names)), dtype=np.float32)
+            for j, name in enumerate(feature_names):
+                X_array[:, j] = np.fromiter(
+                    (sample.get(name, 0.0) for sample in X), dtype=np.float32, count=len(X)
+                )
+            y_array = np.asarray(y, dtype=np.float32)
             
             logger.info(f"Prepared {len(X_array)} samples with {len(feature_names)} features")
             return X_array, y_array, feature_names
@@ -84,21 +110,29 @@ class MLModelTrainer:
         """
         logger.info(f"Training {self.model_type} model")
         
-        # Split data
+        # Split data; float32 halves the bytes touched per split scan
         X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=42
+            X.astype(np.float32, copy=False), y, test_size=test_size, random_state=42
         )
         
         # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        if self.scaler is not None:
+            X_train_scaled = self.scaler.fit_transform(X_train)
+            X_test_scaled = self.scaler.transform(X_test)
+        else:
+            X_train_scaled, X_test_scaled = X_train, X_test
         
         # Select and train model
         if self.model_type == "xgboost":
+            # hist makes fit() quantize straight into a QuantileDMatrix
+            # instead of keeping a full-precision copy of the training set
             self.model = xgb.XGBRegressor(
                 n_estimators=100,
                 max_depth=6,
                 learning_rate=0.1,
+                tree_method="hist",
+                max_bin=256,
+                device="cpu",
                 random_state=42,
                 verbosity=0
             )
@@ -121,6 +155,7 @@ class MLModelTrainer:
         
         # Train on scaled data
         self.model.fit(X_train_scaled, y_train)
+        self._cache_importances()
         
         # Evaluate
         y_pred = self.model.predict(X_test_scaled)
@@ -151,26 +186,126 @@ class MLModelTrainer:
         
         self.model_version = datetime.utcnow().isoformat()
         
-        # Save model and scaler
-        joblib.dump(self.model, f"{model_path}_model.pkl")
-        joblib.dump(self.scaler, f"{model_path}_scaler.pkl")
-        joblib.dump(self.feature_names, f"{model_path}_features.pkl")
+        # xgboost has a native JSON format that reloads faster than a pickle;
+        # the sklearn models still go through joblib
+        if self.model_type == "xgboost":
+            self.model.save_model(f"{model_path}_model.json")
+        else:
+            joblib.dump(self.model, f"{model_path}_model.pkl")
+        
+        # Model type, feature names and scaler parameters in one artifact
+        metadata = {
+            "model_type": np.array(self.model_type),
+            "feature_names": np.array(self.feature_names, dtype=str),
+        }
+        if self.scaler is not None:
+            metadata["scaler_mean"] = self.scaler.mean_
+            metadata["scaler_scale"] = self.scaler.scale_
+        np.savez_compressed(f"{model_path}_meta.npz", **metadata)
+        self._export_compiled(model_path)
+        
+        # The new mtimes already miss the cache; drop the superseded trainers
+        _load_trainer_version.cache_clear()
         
         logger.info(f"Model saved to {model_path}")
         return self.model_version
     
+    def _export_compiled(self, model_path: str) -> None:
+        """Compile an xgboost model to a native library for low-latency inference.
+        
+        Args:
+            model_path: Path prefix the model was saved under
+        """
+        libpath = f"{model_path}_tl.so"
+        # A library left over from an earlier model must not shadow this one
+        if os.path.exists(libpath):
+            os.remove(libpath)
+        if self.model_type != "xgboost" or tl2cgen is None:
+            return
+        
+        try:
+            tl_model = treelite.frontend.from_xgboost(self.model.get_booster())
+            tl2cgen.export_lib(
+                tl_model,
+                toolchain="gcc",
+                libpath=libpath,
+                params={"parallel_comp": 32},
+                verbose=False
+            )
+            logger.info(f"Compiled model exported to {libpath}")
+        except Exception as e:
+            logger.warning(f"Failed to compile model with Treelite: {e}")
+    
     def load_model(self, model_path: str) -> None:
         """Load saved model and scaler.
         
         Args:
             model_path: Path to load model from
         """
-        self.model = joblib.load(f"{model_path}_model.pkl")
-        self.scaler = joblib.load(f"{model_path}_scaler.pkl")
-        self.feature_names = joblib.load(f"{model_path}_features.pkl")
+        meta_path = f"{model_path}_meta.npz"
+        if os.path.exists(meta_path):
+            with np.load(meta_path, allow_pickle=False) as metadata:
+                self.model_type = str(metadata["model_type"])
+                self.feature_names = metadata["feature_names"].tolist()
+                self.scaler = None
+                if "scaler_mean" in metadata:
+                    self.scaler = StandardScaler()
+                    self.scaler.mean_ = metadata["scaler_mean"]
+                    self.scaler.scale_ = metadata["scaler_scale"]
+                    self.scaler.var_ = self.scaler.scale_ ** 2
+                    self.scaler.n_features_in_ = len(self.scaler.mean_)
+            
+            if self.model_type == "xgboost":
+                self.model = xgb.XGBRegressor()
+                self.model.load_model(f"{model_path}_model.json")
+            else:
+                self.model = joblib.load(f"{model_path}_model.pkl")
+        else:
+            # Artifacts saved before the metadata file existed
+            self.model = joblib.load(f"{model_path}_model.pkl")
+            scaler_path = f"{model_path}_scaler.pkl"
+            self.scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
+            self.feature_names = joblib.load(f"{model_path}_features.pkl")
+        self._cache_importances()
+        
+        # Training fans out across all cores, but serving mostly scores single
+        # rows where spinning up a thread pool costs more than the prediction
+        if hasattr(self.model, "n_jobs"):
+            self.model.set_params(n_jobs=self.serving_nthread)
+        if hasattr(self.model, "get_booster"):
+            self.model.get_booster().set_param({"nthread": self.serving_nthread})
+        
+        self._tl_predictor = None
+        libpath = f"{model_path}_tl.so"
+        if tl2cgen is not None and os.path.exists(libpath):
+            try:
+                self._tl_predictor = tl2cgen.Predictor(libpath, nthread=self.serving_nthread)
+            except Exception as e:
+                logger.warning(f"Failed to load compiled model, using {self.model_type}: {e}")
+        
+        # Pay first-call costs (lazy allocations, thread pool setup, cold pages)
+        # here rather than on the first ranking request
+        if self.feature_names:
+            self.predict(np.zeros((1, len(self.feature_names)), dtype=np.float32))
         
         logger.info(f"Model loaded from {model_path}")
     
+    def feature_vector(self, features: Dict[str, float]) -> np.ndarray:
+        """Gather a feature dict into a 1×F row in the model's feature order.
+        
+        Args:
+            features: Dictionary of feature_name: feature_value; missing features are 0.0
+            
+        Returns:
+            float32 array of shape (1, len(feature_names))
+        """
+        # map() over dict.get runs the lookups in C rather than a Python loop
+        return np.fromiter(
+            map(features.get, self.feature_names, repeat(0.0)),
+            dtype=np.float32,
+            count=len(self.feature_names)
+        ).reshape(1, -1)
+    
     def predict(self, X: np.ndarray) -> np.ndarray:
         """Make predictions.
         
@@ -183,7 +318,9 @@ class MLModelTrainer:
         if not self.model:
             raise ValueError("No trained model")
         
-        X_scaled = self.scaler.transform(X)
+        X_scaled = self.scaler.transform(X) if self.scaler is not None else X
+        if self._tl_predictor is not None:
+            return self._tl_predictor.predict(tl2cgen.DMatrix(X_scaled)).reshape(len(X_scaled))
         return self.model.predict(X_scaled)
     
     def get_feature_importance(self) -> Dict[str, float]:
@@ -192,19 +329,52 @@ class MLModelTrainer:
         Returns:
             Dictionary of feature_name: importance_score
         """
-        if not hasattr(self.model, 'feature_importances_'):
+        if self._importances_sorted is None:
             raise ValueError("Model doesn't support feature importance")
+        return self._importances_sorted
+    
+    def _cache_importances(self) -> None:
+        """Sort the model's feature importances once; they don't change after fitting."""
+        if not hasattr(self.model, 'feature_importances_'):
+            self._importances_sorted = None
+            return
         
-        importances = self.model.feature_importances_
-        importance_dict = dict(zip(self.feature_names, importances))
+        importance_dict = dict(zip(self.feature_names, self.model.feature_importances_.tolist()))
         
         # Sort by importance
-        sorted_importances = dict(
+        self._importances_sorted = dict(
             sorted(importance_dict.items(), key=lambda x: x[1], reverse=True)
         )
         
-        logger.info(f"Top 5 features: {list(sorted_importances.items())[:5]}")
-        return sorted_importances
+        logger.info(f"Top 5 features: {list(self._importances_sorted.items())[:5]}")
+
+
+def _artifact_stamp(model_path: str) -> Tuple[int, ...]:
+    """Modification times of the artifacts load_model reads, 0 if missing."""
+    stamps = []
+    for suffix in ("_meta.npz", "_model.json", "_model.pkl"):
+        try:
+            stamps.append(os.stat(f"{model_path}{suffix}").st_mtime_ns)
+        except FileNotFoundError:
+            stamps.append(0)
+    return tuple(stamps)
+
+
+def _load_trainer(model_path: str) -> MLModelTrainer:
+    """Load model artifacts once per process and version; rankers share the result.
+    
+    Keyed by the artifacts' mtimes as well as the path, so a model saved by
+    another process is picked up by the next ranker built here.
+    """
+    return _load_trainer_version(model_path, _artifact_stamp(model_path))
+
+
+@lru_cache(maxsize=4)
+def _load_trainer_version(model_path: str, stamp: Tuple[int, ...]) -> MLModelTrainer:
+    """Load one version of the artifacts; stamp only distinguishes cache keys."""
+    trainer = MLModelTrainer(None)
+    trainer.load_model(model_path)
+    return trainer
 
 
 class PropositionRanker:
@@ -218,11 +388,46 @@ class PropositionRanker:
             model_path: Path to trained model
         """
         self.db = db
-        self.trainer = MLModelTrainer(db)
-        self.trainer.load_model(model_path)
+        self.model_path = model_path
+        # Loaded models are read-only, so rankers built per request share one
+        self.trainer = _load_trainer(model_path)
         self.feature_engineer = FeatureEngineer(db)
         self.proposition_repo = PropositionRepository(db)
     
+    def rank_many(
+        self,
+        user_ids: List[UUID],
+        propositions_ids: List[UUID],
+        top_k: int = 5,
+        max_workers: Optional[int] = None
+    ) -> Dict[UUID, List[Tuple[UUID, float]]]:
+        """Rank the same candidate propositions for many users in parallel.
+        
+        Users are spread over worker processes, each with its own session and a
+        single-threaded copy of the model. Processes rather than threads: model
+        prediction holds the GIL and threaded xgboost oversubscribes cores.
+        
+        Args:
+            user_ids: Users to rank for
+            propositions_ids: List of proposition IDs to rank
+            top_k: Return top K propositions per user
+            max_workers: Worker processes (CPU count if None)
+            
+        Returns:
+            Dictionary of user_id: ranking as returned by rank_propositions
+        """
+        logger.info(f"Ranking {len(propositions_ids)} propositions for {len(user_ids)} users")
+        
+        with ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            initializer=_init_rank_worker,
+            initargs=(self.model_path,)
+        ) as executor:
+            rankings = executor.map(
+                _rank_in_worker, user_ids, repeat(propositions_ids), repeat(top_k), chunksize=32
+            )
+            return dict(zip(user_ids, rankings))
+    
     def rank_propositions(
         self, 
         user_id: UUID, 
@@ -243,24 +448,28 @@ class PropositionRanker:
         
         # Get user features
         user_features = self.feature_engineer.engineer_all_features(user_id)
-        feature_vector = np.array([user_features.get(f, 0.0) 
-                                   for f in self.trainer.feature_names]).reshape(1, -1)
+        feature_vector = self.trainer.feature_vector(user_features)
         
         # Get scores
         scores = self.trainer.predict(feature_vector)[0]
         
-        # Create ranking with proposition scores
-        rankings = []
-        for prop_id in propositions_ids:
-            prop = self.proposition_repo.read(prop_id)
-            if prop:
-                # Combine model score with proposition confidence
-                combined_score = 0.6 * scores + 0.4 * prop.confidence_score
-                rankings.append((prop_id, float(combined_score)))
-        
-        # Sort by score and return top_k
-        rankings.sort(key=lambda x: x[1], reverse=True)
-        return rankings[:top_k]
+        # Fetch every candidate in one query
+        by_id = self.proposition_repo.read_many(propositions_ids)
+        props = [by_id[prop_id] for prop_id in propositions_ids if prop_id in by_id]
+        if not props or top_k <= 0:
+            return []
+        
+        # Combine model score with proposition confidence, in place on the
+        # confidence buffer so no intermediate arrays are allocated
+        combined = np.fromiter((p.confidence_score for p in props), dtype=np.float32, count=len(props))
+        combined *= 0.4
+        combined += 0.6 * float(scores)
+        
+        # Partial sort: O(N) selection, then only the top k candidates get ordered
+        k = min(top_k, combined.size)
+        top_idx = np.argpartition(-combined, k - 1)[:k]
+        top_idx = top_idx[np.argsort(-combined[top_idx])]
+        return [(props[i].id, float(combined[i])) for i in top_idx]
     
     def get_ranking_explanation(self, user_id: UUID) -> Dict[str, any]:
         """Get explanation for ranking decision.
@@ -286,6 +495,25 @@ class PropositionRanker:
         }
 
 
+# Per-process ranker used by rank_many's worker processes
+_worker_ranker: Optional[PropositionRanker] = None
+
+
+def _init_rank_worker(model_path: str) -> None:
+    """Process pool initializer: build this worker's session and ranker."""
+    global _worker_ranker
+    from storage.database import SessionLocal, engine
+    
+    # Connections inherited from the parent process must not be reused here
+    engine.dispose(close=False)
+    _worker_ranker = PropositionRanker(SessionLocal(), model_path)
+
+
+def _rank_in_worker(user_id: UUID, propositions_ids: List[UUID], top_k: int) -> List[Tuple[UUID, float]]:
+    """Rank propositions for one user inside a worker process."""
+    return _worker_ranker.rank_propositions(user_id, propositions_ids, top_k)
+
+
 class ModelVersionManager:
     """Manages model versions and persistence."""
     
@@ -1,12 +1,18 @@
 """Monitoring and metrics collection for Predictive Propositions Service."""
 import logging
+import queue
+import threading
 import time
-from typing import Dict, Optional, Callable
-from datetime import datetime
+from typing import Dict, List, Optional, Callable, Tuple
+from datetime import datetime, timezone
 from functools import wraps
 from dataclasses import dataclass, asdict
 import json
+from collections import deque
+from heapq import merge
 from enum import Enum
+from itertools import islice
+import numpy as np
 
 try:
     from prometheus_client import Counter, Histogram, Gauge
@@ -17,6 +23,14 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+def _percentiles(values: List[float], quantiles: Tuple[float, ...]) -> List[float]:
+    """Nearest-rank percentiles via a single O(N) partition instead of full sorts."""
+    arr = np.asarray(values, dtype=np.float64)
+    ranks = [min(int(len(arr) * q), len(arr) - 1) for q in quantiles]
+    partitioned = np.partition(arr, ranks)
+    return [float(partitioned[r]) for r in ranks]
+
+
 class MetricType(str, Enum):
     """Types of metrics to track."""
     COUNTER = "counter"
@@ -24,6 +38,16 @@ class MetricType(str, Enum):
     HISTOGRAM = "histogram"
 
 
+def now_us() -> int:
+    """Current time in epoch microseconds, for metric timestamps."""
+    return time.time_ns() // 1000
+
+
+def _format_timestamp(timestamp_us: int) -> str:
+    """ISO 8601 UTC string for an epoch-microseconds timestamp."""
+    return datetime.fromtimestamp(timestamp_us / 1e6, tz=timezone.utc).isoformat()
+
+
 @dataclass
 class RequestMetric:
     """Request metrics."""
@@ -31,13 +55,13 @@ class RequestMetric:
     method: str
     status_code: int
     latency_ms: float
-    timestamp: str
+    timestamp_us: int  # Epoch microseconds; formatted only when serialized
     user_id: Optional[str] = None
     error: Optional[str] = None
 
     def to_dict(self) -> Dict:
         """Convert to dictionary."""
-        return asdict(self)
+        return {**asdict(self), "timestamp": _format_timestamp(self.timestamp_us)}
 
 
 @dataclass
@@ -49,11 +73,11 @@ class ModelMetric:
     model_version: str
     latency_ms: float
     served_by: str  # 'ml_ranker' or 'fallback'
-    timestamp: str
+    timestamp_us: int  # Epoch microseconds; formatted only when serialized
 
     def to_dict(self) -> Dict:
         """Convert to dictionary."""
-        return asdict(self)
+        return {**asdict(self), "timestamp": _format_timestamp(self.timestamp_us)}
 
 
 class MetricsCollector:
@@ -66,14 +90,26 @@ class MetricsCollector:
             service_name: Name of the service for metrics
         """
         self.service_name = service_name
-        self.metrics_buffer = []
         self.max_buffer_size = 10000
+        # Ring buffers per metric type: appends past max_buffer_size evict the
+        # oldest metric in O(1), and no scan is needed to split them by type
+        self._requests = deque(maxlen=self.max_buffer_size)
+        self._inferences = deque(maxlen=self.max_buffer_size)
+        # Bumped on every record so get_summary can reuse its latency stats
+        self._records = 0
+        self._latency_stats: Tuple[int, Dict] = (-1, {})
         
         # Initialize Prometheus metrics if available
         if HAS_PROMETHEUS:
             self._init_prometheus_metrics()
         else:
             logger.warning("Prometheus client not installed. Using in-memory metrics only.")
+        
+        # Recording only enqueues; buffering and Prometheus label lookups run on
+        # a background thread, off the request path
+        self._pending: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._consumer = threading.Thread(target=self._consume, name="metrics-consumer", daemon=True)
+        self._consumer.start()
 
     def _init_prometheus_metrics(self):
         """Initialize Prometheus metrics."""
@@ -117,12 +153,32 @@ class MetricsCollector:
         Args:
             metric: RequestMetric instance
         """
-        self.metrics_buffer.append(metric)
+        self._pending.put_nowait(metric)
+
+    def record_model_inference(self, metric: ModelMetric) -> None:
+        """Record ML model inference metric.
         
-        # Manage buffer size
-        if len(self.metrics_buffer) > self.max_buffer_size:
-            # Keep only recent metrics
-            self.metrics_buffer = self.metrics_buffer[-self.max_buffer_size:]
+        Args:
+            metric: ModelMetric instance
+        """
+        self._pending.put_nowait(metric)
+
+    def _consume(self) -> None:
+        """Apply queued metrics to the buffers and Prometheus, forever."""
+        while True:
+            metric = self._pending.get()
+            try:
+                if isinstance(metric, RequestMetric):
+                    self._store_request(metric)
+                else:
+                    self._store_inference(metric)
+            except Exception as e:
+                logger.error(f"Failed to record metric: {e}")
+
+    def _store_request(self, metric: RequestMetric) -> None:
+        """Buffer a request metric and update Prometheus."""
+        self._requests.append(metric)
+        self._records += 1
         
         if HAS_PROMETHEUS:
             self.request_count.labels(
@@ -135,16 +191,10 @@ class MetricsCollector:
                 endpoint=metric.endpoint
             ).observe(metric.latency_ms)
 
-    def record_model_inference(self, metric: ModelMetric) -> None:
-        """Record ML model inference metric.
-        
-        Args:
-            metric: ModelMetric instance
-        """
-        self.metrics_buffer.append(metric)
-        
-        if len(self.metrics_buffer) > self.max_buffer_size:
-            self.metrics_buffer = self.metrics_buffer[-self.max_buffer_size:]
+    def _store_inference(self, metric: ModelMetric) -> None:
+        """Buffer a model inference metric and update Prometheus."""
+        self._inferences.append(metric)
+        self._records += 1
         
         if HAS_PROMETHEUS:
             self.ml_inference_latency.observe(metric.latency_ms)
@@ -183,10 +233,28 @@ class MetricsCollector:
         Returns:
             List of metrics
         """
-        metrics = self.metrics_buffer[-limit:]
-        if metric_type:
-            metrics = [m for m in metrics if isinstance(m).__name__ == metric_type]
-        return [m.to_dict() if hasattr(m, 'to_dict') else m for m in metrics]
+        if metric_type == RequestMetric.__name__:
+            metrics = self._tail(self._requests, limit)
+        elif metric_type == ModelMetric.__name__:
+            metrics = self._tail(self._inferences, limit)
+        elif metric_type:
+            metrics = []
+        else:
+            # Interleave the two tails chronologically, then keep the newest
+            metrics = list(merge(
+                self._tail(self._requests, limit),
+                self._tail(self._inferences, limit),
+                key=lambda m: m.timestamp_us
+            ))[-limit:]
+        return [m.to_dict() for m in metrics]
+
+    @staticmethod
+    def _tail(buffer: deque, limit: int) -> list:
+        """Last `limit` entries of a ring buffer, oldest first.
+        
+        Walks from the newest end, so the cost is O(limit) rather than O(len(buffer)).
+        """
+        return list(islice(reversed(buffer), limit))[::-1]
 
     def get_summary(self) -> Dict:
         """Get metrics summary.
@@ -194,30 +262,46 @@ class MetricsCollector:
         Returns:
             Dictionary with metrics summary
         """
-        request_metrics = [m for m in self.metrics_buffer if isinstance(m, RequestMetric)]
-        model_metrics = [m for m in self.metrics_buffer if isinstance(m, ModelMetric)]
-        
         summary = {
+            "buffer_size": len(self._requests) + len(self._inferences),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+        # Recompute only when something was recorded since the last call
+        records, stats = self._latency_stats
+        if records != self._records:
+            stats = self._compute_latency_stats()
+            self._latency_stats = (self._records, stats)
+        summary.update(stats)
+        return summary
+
+    def _compute_latency_stats(self) -> Dict:
+        """Compute counts, latency percentiles and error rate over the buffers."""
+        # Snapshots, since the consumer thread may append while we iterate
+        request_metrics = self._requests.copy()
+        model_metrics = self._inferences.copy()
+        
+        stats = {
             "total_requests": len(request_metrics),
             "total_inferences": len(model_metrics),
-            "buffer_size": len(self.metrics_buffer),
-            "timestamp": datetime.utcnow().isoformat()
         }
         
         if request_metrics:
             latencies = [m.latency_ms for m in request_metrics]
-            summary["request_latency_p50"] = sorted(latencies)[len(latencies)//2]
-            summary["request_latency_p95"] = sorted(latencies)[int(len(latencies)*0.95)]
-            summary["request_latency_p99"] = sorted(latencies)[int(len(latencies)*0.99)]
-            summary["error_rate"] = len([m for m in request_metrics if m.error]) / len(request_metrics)
+            p50, p95, p99 = _percentiles(latencies, (0.5, 0.95, 0.99))
+            stats["request_latency_p50"] = p50
+            stats["request_latency_p95"] = p95
+            stats["request_latency_p99"] = p99
+            stats["error_rate"] = sum(1 for m in request_metrics if m.error) / len(request_metrics)
         
         if model_metrics:
             model_latencies = [m.latency_ms for m in model_metrics]
-            summary["ml_latency_p50"] = sorted(model_latencies)[len(model_latencies)//2]
-            summary["ml_latency_p95"] = sorted(model_latencies)[int(len(model_latencies)*0.95)]
-            summary["ml_latency_avg"] = sum(model_latencies) / len(model_latencies)
+            p50, p95 = _percentiles(model_latencies, (0.5, 0.95))
+            stats["ml_latency_p50"] = p50
+            stats["ml_latency_p95"] = p95
+            stats["ml_latency_avg"] = sum(model_latencies) / len(model_latencies)
         
-        return summary
+        return stats
 
 
 def track_endpoint(collector: MetricsCollector) -> Callable:
@@ -254,7 +338,7 @@ def track_endpoint(collector: MetricsCollector) -> Callable:
                     method="POST",  # Default, can be overridden
                     status_code=status_code,
                     latency_ms=latency_ms,
-                    timestamp=datetime.utcnow().isoformat(),
+                    timestamp_us=now_us(),
                     error=error
                 )
                 collector.record_request(metric)
@@ -283,7 +367,7 @@ def track_endpoint(collector: MetricsCollector) -> Callable:
                     method="POST",
                     status_code=status_code,
                     latency_ms=latency_ms,
-                    timestamp=datetime.utcnow().isoformat(),
+                    timestamp_us=now_us(),
                     error=error
                 )
                 collector.record_request(metric)
@@ -1,13 +1,22 @@
 """Database configuration and session management."""
+import asyncio
 import os
+from contextlib import contextmanager
 from typing import Generator
-from sqlalchemy import create_engine, event, Engine
+from sqlalchemy import create_engine, event, text, Engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool, QueuePool
+from psycopg2.extras import Json, execute_values, register_uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Raw-cursor inserts pass uuid.UUID values straight to psycopg2
+register_uuid()
+
+# Rows per multi-row INSERT statement in bulk inserts
+BULK_INSERT_PAGE_SIZE = 1000
+
 
 class DatabaseConfig:
     """Database configuration settings."""
@@ -20,9 +29,12 @@ class DatabaseConfig:
     
     # Connection pool settings
     POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
-    MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
     POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
-    POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))  # Recycle connections every hour
+    POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Recycle connections every 30 minutes
+    # Ping on checkout so connections dropped by the server or a proxy between
+    # recycles are replaced instead of failing the request
+    POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
     
     # Use NullPool for serverless/stateless environments
     USE_NULL_POOL = os.getenv("USE_NULL_POOL", "false").lower() == "true"
@@ -38,40 +50,53 @@ def get_engine() -> Engine:
         # For serverless environments (Lambda, Cloud Functions)
         engine = create_engine(
             DatabaseConfig.DATABASE_URL,
-            echo=DatabaseConfig.ECHO_SQL,
             poolclass=NullPool,
+            future=True,
         )
     else:
         # Standard connection pool for persistent servers
+        # LIFO reuse keeps a small set of connections (and their backends'
+        # caches) warm, and lets the idle tail age out via pool_recycle
         engine = create_engine(
             DatabaseConfig.DATABASE_URL,
-            echo=DatabaseConfig.ECHO_SQL,
             poolclass=QueuePool,
             pool_size=DatabaseConfig.POOL_SIZE,
             max_overflow=DatabaseConfig.MAX_OVERFLOW,
             pool_timeout=DatabaseConfig.POOL_TIMEOUT,
             pool_recycle=DatabaseConfig.POOL_RECYCLE,
+            pool_use_lifo=True,
+            pool_pre_ping=DatabaseConfig.POOL_PRE_PING,
+            future=True,
             connect_args={
                 "connect_timeout": 10,
                 "application_name": "predictive_propositions"
             }
         )
     
-    # Add event listeners for connection monitoring
-    @event.listens_for(Engine, "connect")
+    # SQL echo is a logger level rather than an engine option
+    if DatabaseConfig.ECHO_SQL:
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+    
+    # Add event listeners for connection monitoring; registered on this engine
+    # only, not on the Engine class, so other engines don't inherit them
+    @event.listens_for(engine, "connect")
     def receive_connect(dbapi_conn, connection_record):
         """Set connection parameters on new connections."""
-        # Enable UUID support in PostgreSQL
-        dbapi_conn.execute("CREATE EXTENSION IF NOT EXISTS \"uuid-ossp\"")
-        # Set application timezone to UTC
-        dbapi_conn.execute("SET timezone TO 'UTC'")
+        # Set application timezone to UTC; autocommit so the pool's reset
+        # rollback can't undo the SET
+        existing_autocommit = dbapi_conn.autocommit
+        dbapi_conn.autocommit = True
+        cursor = dbapi_conn.cursor()
+        cursor.execute("SET timezone TO 'UTC'")
+        cursor.close()
+        dbapi_conn.autocommit = existing_autocommit
     
-    @event.listens_for(Engine, "pool_connect")
-    def receive_pool_connect(dbapi_conn, connection_record):
+    @event.listens_for(engine, "checkout")
+    def receive_checkout(dbapi_conn, connection_record, connection_proxy):
         """Log pool connection events."""
         logger.debug(f"Database connection established from pool")
     
-    @event.listens_for(Engine, "close")
+    @event.listens_for(engine, "close")
     def receive_close(dbapi_conn, connection_record):
         """Log connection close events."""
         logger.debug(f"Database connection closed")
@@ -81,7 +106,9 @@ def get_engine() -> Engine:
 
 # Create engine and session factory
 engine = get_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay loaded after commit: write endpoints return the instance once
+# UnitOfWork has committed, and repositories no longer refresh it
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -99,11 +126,64 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+class UnitOfWork:
+    """Groups repository writes into one transaction.
+    
+    Repositories only flush; the outermost transaction() block commits once
+    (a single WAL flush per request rather than per mutation) or rolls
+    everything back on error.
+    """
+    
+    def __init__(self, db: Session):
+        """Initialize with the session the repositories share.
+        
+        Args:
+            db: SQLAlchemy session
+        """
+        self.db = db
+        self._depth = 0
+    
+    @contextmanager
+    def transaction(self) -> Generator[Session, None, None]:
+        """Commit on successful exit of the outermost block, roll back on error."""
+        self._depth += 1
+        try:
+            yield self.db
+            if self._depth == 1:
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            self._depth -= 1
+
+
+def get_uow() -> Generator[UnitOfWork, None, None]:
+    """Dependency injection function for FastAPI endpoints that write.
+    
+    Usage:
+        @app.post("/")
+        def create(uow: UnitOfWork = Depends(get_uow)):
+            with uow.transaction():
+                UserRepository(uow.db).create(...)
+    """
+    db = SessionLocal()
+    try:
+        yield UnitOfWork(db)
+    finally:
+        db.close()
+
+
 def init_db():
     """Initialize database and create all tables."""
     from .models import Base
     
     logger.info("Creating database tables...")
+    # Enable UUID support and trigram indexes in PostgreSQL; needed once per
+    # database, not per connection
+    with engine.begin() as conn:
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"'))
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created successfully")
 
@@ -122,10 +202,57 @@ class AsyncDatabaseManager:
     
     @staticmethod
     async def execute_bulk_insert(records: list, model_class):
-        """Execute bulk insert operation."""
+        """Execute bulk insert operation without blocking the event loop."""
+        await asyncio.to_thread(AsyncDatabaseManager._bulk_insert, records, model_class)
+    
+    @staticmethod
+    def _bulk_insert(records: list, model_class):
+        """Insert records with psycopg2's execute_values on the raw connection.
+        
+        Rows are sent as multi-row VALUES pages instead of one parameterized
+        INSERT per row. Python-side column defaults (e.g. uuid4 primary keys)
+        are applied here since the ORM is bypassed. Records are grouped by
+        key set and each group gets its own column list, so a column a record
+        omits falls back to its default instead of an explicit NULL.
+        """
+        if not records:
+            return
+        
+        table = model_class.__table__
+        defaults = {
+            column.name: column.default
+            for column in table.columns
+            if column.default is not None and (column.default.is_scalar or column.default.is_callable)
+        }
+        
+        def value(record: dict, name: str):
+            if name in record:
+                v = record[name]
+            else:
+                default = defaults[name]
+                v = default.arg(None) if default.is_callable else default.arg
+            return Json(v) if isinstance(v, (dict, list)) else v
+        
+        # Usually every record has the same keys and this is a single group
+        groups: dict = {}
+        for record in records:
+            groups.setdefault(frozenset(record), []).append(record)
+        
         db = SessionLocal()
         try:
-            db.bulk_insert_mappings(model_class, records)
+            cursor = db.connection().connection.cursor()
+            try:
+                for group in groups.values():
+                    columns = list(dict.fromkeys([*group[0], *defaults]))
+                    column_list = ", ".join(f'"{name}"' for name in columns)
+                    execute_values(
+                        cursor,
+                        f'INSERT INTO "{table.name}" ({column_list}) VALUES %s',
+                        [tuple(value(record, name) for name in columns) for record in group],
+                        page_size=BULK_INSERT_PAGE_SIZE
+                    )
+            finally:
+                cursor.close()
             db.commit()
             logger.info(f"Bulk inserted {len(records)} {model_class.__name__} records")
         except Exception as e:
@@ -1,14 +1,34 @@
 """Database models for Predictive Propositions Service."""
 import uuid
-from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, ForeignKey, Table, Text, JSON, Index
+from sqlalchemy import Column, String, Integer, BigInteger, Identity, Float, DateTime, Boolean, ForeignKey, Table, Text, JSON, Index, LargeBinary, text, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ENUM
 
 Base = declarative_base()
 
+# JSONB columns get GIN indexes with jsonb_path_ops: about half the size of the
+# default jsonb_ops and serving @> containment filters (see
+# BaseRepository.filter_by_metadata). They don't help ->/->> extraction, so
+# scalar keys filtered by value get btree expression indexes, listed here per
+# table; BaseRepository.filter_by_metadata_key routes other keys through @>.
+INDEXED_JSONB_PATHS = {
+    "propositions": ("model_version",),
+}
+
+# Timestamps are filled in by PostgreSQL (now(), evaluated in the INSERT or
+# UPDATE statement itself) and read back via RETURNING. Columns stay naive
+# timestamps: every connection runs with timezone UTC (see database.py), so
+# now() stores UTC wall time, matching the datetime.utcnow() values used in
+# Python comparisons.
+
+# Each model declares __order_key__: the columns, most significant first, that
+# BaseRepository.paginate orders by (descending) and seeks past with a cursor.
+# The trailing primary key makes the order total. Order key columns must be
+# NOT NULL: the row-value comparison never matches a NULL, so such rows would
+# drop out of every page after the first.
+
 
 class PropositionType(str, Enum):
     """Types of propositions the system can generate."""
@@ -19,75 +39,134 @@ class PropositionType(str, Enum):
     CONTENT_RECOMMENDATION = "content_recommendation"
 
 
+class PropositionStatus(str, Enum):
+    """Lifecycle states of a proposition."""
+    PENDING = "pending"
+    ACCEPTED = "accepted"
+    REJECTED = "rejected"
+    EXPIRED = "expired"
+
+
+class InteractionType(str, Enum):
+    """Ways a user can interact with a proposition."""
+    CLICK = "click"
+    HOVER = "hover"
+    ACCEPT = "accept"
+    REJECT = "reject"
+    IGNORE = "ignore"
+
+
+def _pg_enum(enum_cls: type, name: str) -> ENUM:
+    """Native PostgreSQL enum over the members' values.
+    
+    Stored in 4 bytes instead of a VARCHAR, and read back as plain strings
+    so comparisons and dict keys behave as they did with String columns.
+    """
+    return ENUM(*(member.value for member in enum_cls), name=name)
+
+
 class User(Base):
     """User model."""
     __tablename__ = "users"
+    __order_key__ = ("created_at", "id")
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     username = Column(String(255), unique=True, nullable=False, index=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     is_active = Column(Boolean, default=True)
     metadata_json = Column(JSONB, nullable=True)
     
     # Relationships
     interactions = relationship("Interaction", back_populates="user", cascade="all, delete-orphan")
     features = relationship("UserFeature", back_populates="user", cascade="all, delete-orphan")
+    feature_vector = relationship("UserFeatureVector", back_populates="user", uselist=False, cascade="all, delete-orphan")
     propositions = relationship("Proposition", back_populates="user", cascade="all, delete-orphan")
+    __table_args__ = (
+        Index("idx_user_meta_gin", "metadata_json", postgresql_using="gin", postgresql_ops={"metadata_json": "jsonb_path_ops"}),
+        # Trigram GIN (pg_trgm, enabled in init_db) lets UserRepository.search_users'
+        # ILIKE '%q%' use an index; the btree indexes above can't serve a leading wildcard
+        Index("idx_users_username_trgm", "username", postgresql_using="gin", postgresql_ops={"username": "gin_trgm_ops"}),
+        Index("idx_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        # Partial covering indexes for the active/inactive listings, newest first;
+        # INCLUDE lets index-only scans return username and email without heap visits
+        Index("idx_users_active_created", text("created_at DESC"), text("id DESC"), postgresql_include=["username", "email"], postgresql_where=text("is_active = true")),
+        Index("idx_users_inactive_created", text("created_at DESC"), text("id DESC"), postgresql_include=["username", "email"], postgresql_where=text("is_active = false")),
+    )
 
 
 class Proposition(Base):
     """Proposition model - represents ML-generated suggestions."""
     __tablename__ = "propositions"
+    __order_key__ = ("created_at", "id")
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    proposition_type = Column(String(50), nullable=False, index=True)
+    # user_id lookups (and the FK cascade) use idx_user_type_status, which leads with it
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    proposition_type = Column(_pg_enum(PropositionType, "proposition_type_enum"), nullable=False)
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=False)
     confidence_score = Column(Float, nullable=False)  # 0.0-1.0
     predicted_engagement = Column(Float, nullable=True)  # Expected engagement probability
     feature_importance = Column(JSONB, nullable=True)  # {"feature_name": importance_score}
-    status = Column(String(50), default="pending", index=True)  # pending, accepted, rejected, expired
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    status = Column(_pg_enum(PropositionStatus, "proposition_status_enum"), default="pending", index=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
     expires_at = Column(DateTime, nullable=True)
     metadata_json = Column(JSONB, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="propositions")
     interactions = relationship("Interaction", back_populates="proposition", cascade="all, delete-orphan")
-    __table_args__ = (Index("idx_user_type_status", "user_id", "proposition_type", "status"),)
+    __table_args__ = (
+        Index("idx_user_type_status", "user_id", "proposition_type", "status"),
+        Index("idx_prop_meta_gin", "metadata_json", postgresql_using="gin", postgresql_ops={"metadata_json": "jsonb_path_ops"}),
+        Index("idx_prop_fi_gin", "feature_importance", postgresql_using="gin", postgresql_ops={"feature_importance": "jsonb_path_ops"}),
+        Index("idx_prop_meta_model_version", text("(metadata_json->>'model_version')")),
+        # Pending is the status served and re-ranked; the partial index holds
+        # only those rows, newest first per user
+        Index("idx_prop_pending_user", "user_id", text("created_at DESC"), postgresql_where=text("status = 'pending'")),
+    )
 
 
 class Interaction(Base):
     """User interaction with propositions (click, hover, accept, reject, etc)."""
     __tablename__ = "interactions"
+    __order_key__ = ("created_at", "id")
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Append-heavy: sequential keys keep btree inserts on the rightmost page
+    id = Column(BigInteger, Identity(always=False), primary_key=True)
+    # user_id lookups (and the FK cascade) use idx_user_timestamp, which leads with it
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     proposition_id = Column(UUID(as_uuid=True), ForeignKey("propositions.id", ondelete="CASCADE"), nullable=False, index=True)
-    interaction_type = Column(String(50), nullable=False, index=True)  # click, hover, accept, reject, ignore
+    interaction_type = Column(_pg_enum(InteractionType, "interaction_type_enum"), nullable=False, index=True)
     duration_seconds = Column(Integer, nullable=True)  # For hover/view interactions
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
     metadata_json = Column(JSONB, nullable=True)  # Device info, location, etc
     
     # Relationships
     user = relationship("User", back_populates="interactions")
     proposition = relationship("Proposition", back_populates="interactions")
-    __table_args__ = (Index("idx_user_timestamp", "user_id", "created_at"),)
+    __table_args__ = (
+        Index("idx_user_timestamp", "user_id", "created_at"),
+        # Rows arrive in created_at order, so a BRIN summary per 32-page range
+        # serves time-range scans at a fraction of a btree's size and write cost
+        Index("idx_inter_created_brin", "created_at", postgresql_using="brin", postgresql_with={"pages_per_range": 32}),
+        Index("idx_interaction_meta_gin", "metadata_json", postgresql_using="gin", postgresql_ops={"metadata_json": "jsonb_path_ops"}),
+    )
 
 
 class Feature(Base):
     """Feature definitions for ML model."""
     __tablename__ = "features"
+    __order_key__ = ("created_at", "id")
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), unique=True, nullable=False, index=True)
-    feature_type = Column(String(50), nullable=False)  # numeric, categorical, text, temporal
+    feature_type = Column(String(50), nullable=False)  # numeric, categorical, text, temporal, boolean
     description = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
     
     # Relationships
     user_features = relationship("UserFeature", back_populates="feature", cascade="all, delete-orphan")
@@ -96,24 +175,55 @@ class Feature(Base):
 class UserFeature(Base):
     """User feature values - time-series data for ML model."""
     __tablename__ = "user_features"
+    __order_key__ = ("timestamp", "id")
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Append-heavy: sequential keys keep btree inserts on the rightmost page
+    id = Column(BigInteger, Identity(always=False), primary_key=True)
+    # user_id lookups (and the FK cascade) use idx_user_feature_time, which leads with it
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     feature_id = Column(UUID(as_uuid=True), ForeignKey("features.id", ondelete="CASCADE"), nullable=False, index=True)
-    value = Column(String(1000), nullable=False)  # Stored as string for flexibility
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Exactly one typed column is set per row, chosen by the value's type:
+    # numbers -> value_num, datetimes -> value_ts, booleans -> value_bool and
+    # anything else -> value_text. Features created on first store get the
+    # matching feature_type (numeric, temporal, boolean, text). value is the
+    # legacy text form, kept for old rows.
+    value = Column(String(1000), nullable=True)
+    value_num = Column(Float, nullable=True)
+    value_text = Column(Text, nullable=True)
+    value_bool = Column(Boolean, nullable=True)
+    value_ts = Column(DateTime, nullable=True)
+    timestamp = Column(DateTime, server_default=func.now(), nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="features")
     feature = relationship("Feature", back_populates="user_features")
-    __table_args__ = (Index("idx_user_feature_time", "user_id", "feature_id", "timestamp"),)
+    __table_args__ = (
+        Index("idx_user_feature_time", "user_id", "feature_id", "timestamp"),
+        Index("idx_user_feature_ts_brin", "timestamp", postgresql_using="brin", postgresql_with={"pages_per_range": 32}),
+        # Numeric range scans and MIN/MAX per feature, skipping non-numeric rows
+        Index("idx_user_feature_num", "feature_id", "value_num", postgresql_where=text("value_num IS NOT NULL")),
+    )
+
+
+class UserFeatureVector(Base):
+    """Latest feature values per user, stored as a single MessagePack blob for serving."""
+    __tablename__ = "user_feature_vectors"
+    __order_key__ = ("user_id",)
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    vector = Column(LargeBinary, nullable=False)  # msgpack-encoded {"feature_name": value}
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+    
+    # Relationships
+    user = relationship("User", back_populates="feature_vector")
 
 
 class ModelPerformance(Base):
     """Track ML model performance metrics over time."""
     __tablename__ = "model_performance"
+    __order_key__ = ("created_at", "id")
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(BigInteger, Identity(always=False), primary_key=True)
     model_version = Column(String(50), nullable=False, index=True)
     accuracy = Column(Float, nullable=False)
     precision = Column(Float, nullable=False)
@@ -124,7 +234,10 @@ class ModelPerformance(Base):
     true_positives = Column(Integer, default=0)
     false_positives = Column(Integer, default=0)
     false_negatives = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
     metadata_json = Column(JSONB, nullable=True)
     
-    __table_args__ = (Index("idx_model_version_date", "model_version", "created_at"),)
+    __table_args__ = (
+        Index("idx_model_version_date", "model_version", "created_at"),
+        Index("idx_model_perf_meta_gin", "metadata_json", postgresql_using="gin", postgresql_ops={"metadata_json": "jsonb_path_ops"}),
+    )
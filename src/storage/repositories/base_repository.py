@@ -1,14 +1,30 @@
 """Base repository class providing common CRUD operations."""
-from typing import TypeVar, Generic, List, Optional, Type, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc, and_, or_
+from typing import TypeVar, Generic, List, Optional, Sequence, Type, Dict, Any, Tuple
+from sqlalchemy.orm import Session, Query, load_only
+from sqlalchemy import desc, asc, and_, or_, tuple_, update as sql_update, exists as sql_exists, inspect as sa_inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from ..models import INDEXED_JSONB_PATHS
 import uuid
 import logging
+import warnings
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
+# Rows per executemany batch in bulk_create, and IDs per IN list in read_many
+BULK_BATCH_SIZE = 1000
+
+# read_all(skip=...) deprecation is reported once per process, not per request
+_skip_deprecation_warned = False
+
+
+@lru_cache(maxsize=None)
+def _column_map(model: Type) -> Dict[str, Any]:
+    """Column attribute name -> instrumented attribute, reflected once per model."""
+    return {attr.key: getattr(model, attr.key) for attr in sa_inspect(model).column_attrs}
+
 
 class BaseRepository(Generic[T]):
     """Generic base repository class for common database operations."""
@@ -22,12 +38,17 @@ class BaseRepository(Generic[T]):
         """
         self.db = db
         self.model = model
+        # Repositories are built per request, so the reflection is cached per model
+        self._columns = _column_map(model)
     
-    def create(self, obj_in: Dict[str, Any]) -> T:
+    def create(self, obj_in: Dict[str, Any], refresh: bool = False) -> T:
         """Create a new record.
         
+        Flushes without committing; wrap writes in UnitOfWork.transaction().
+        
         Args:
             obj_in: Dictionary containing object data
+            refresh: Reload the row after flush, for server-side defaults
             
         Returns:
             Created model instance
@@ -35,13 +56,41 @@ class BaseRepository(Generic[T]):
         try:
             db_obj = self.model(**obj_in)
             self.db.add(db_obj)
-            self.db.commit()
-            self.db.refresh(db_obj)
-            logger.info(f"Created {self.model.__name__} with id {getattr(db_obj, 'id', None)}")
+            self.db.flush()
+            if refresh:
+                self.db.refresh(db_obj)
+            logger.info("Created %s with id %s", self.model.__name__, getattr(db_obj, 'id', None))
             return db_obj
         except Exception as e:
-            self.db.rollback()
-            logger.error(f"Error creating {self.model.__name__}: {str(e)}")
+            logger.error("Error creating %s: %s", self.model.__name__, e)
+            raise
+    
+    def bulk_create(self, rows: List[Dict[str, Any]], ignore_conflicts: bool = False) -> int:
+        """Insert many records with Core executemany batches.
+        
+        Skips ORM instrumentation and SELECT-after-insert; Python-side column
+        defaults such as uuid4 primary keys are still applied. Commits with
+        the surrounding UnitOfWork.
+        
+        Args:
+            rows: One dictionary of column values per record
+            ignore_conflicts: Skip rows that violate a unique constraint
+            
+        Returns:
+            Number of rows submitted
+        """
+        if not rows:
+            return 0
+        try:
+            stmt = pg_insert(self.model)
+            if ignore_conflicts:
+                stmt = stmt.on_conflict_do_nothing()
+            for start in range(0, len(rows), BULK_BATCH_SIZE):
+                self.db.execute(stmt, rows[start:start + BULK_BATCH_SIZE])
+            logger.info("Bulk created %s %s records", len(rows), self.model.__name__)
+            return len(rows)
+        except Exception as e:
+            logger.error("Error bulk creating %s: %s", self.model.__name__, e)
             raise
     
     def read(self, id: Any) -> Optional[T]:
@@ -54,60 +103,189 @@ class BaseRepository(Generic[T]):
             Model instance or None if not found
         """
         try:
-            return self.db.query(self.model).filter(self.model.id == id).first()
+            # Session.get answers from the identity map without SQL when the
+            # row is already loaded, else issues a primary-key lookup
+            return self.db.get(self.model, id)
         except Exception as e:
-            logger.error(f"Error reading {self.model.__name__}: {str(e)}")
+            logger.error("Error reading %s: %s", self.model.__name__, e)
             return None
     
-    def read_all(self, skip: int = 0, limit: int = 100) -> List[T]:
-        """Read all records with pagination.
+    def read_many(self, ids: Sequence) -> Dict[Any, T]:
+        """Read several records by ID with one IN query per batch.
+        
+        Args:
+            ids: Primary key values; missing IDs are skipped
+            
+        Returns:
+            Dictionary of id: model instance
+        """
+        ids = list(ids)
+        found: Dict[Any, T] = {}
+        try:
+            # Batched so very long ID lists don't produce one enormous statement
+            for start in range(0, len(ids), BULK_BATCH_SIZE):
+                batch = ids[start:start + BULK_BATCH_SIZE]
+                for obj in self.db.query(self.model).filter(self.model.id.in_(batch)):
+                    found[obj.id] = obj
+        except Exception as e:
+            logger.error("Error reading many %s: %s", self.model.__name__, e)
+        return found
+    
+    def read_all(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        columns: Optional[Sequence[str]] = None
+    ) -> List[T]:
+        """Read all records with pagination, newest first.
+        
+        Deprecated for skip > 0: OFFSET reads and discards every skipped row,
+        so use paginate with a cursor instead.
         
         Args:
             skip: Number of records to skip
             limit: Maximum records to return
+            columns: Column names to load; others are deferred (all if None)
+            
+        Returns:
+            List of model instances
+        """
+        global _skip_deprecation_warned
+        if not skip:
+            return self.paginate(limit=limit, columns=columns)
+        if not _skip_deprecation_warned:
+            _skip_deprecation_warned = True
+            warnings.warn(
+                "read_all(skip=...) is deprecated; use paginate(cursor, limit)",
+                DeprecationWarning,
+                stacklevel=2
+            )
+        return self._offset_page(skip, limit, columns)
+    
+    def paginate(
+        self,
+        cursor: Optional[Tuple] = None,
+        limit: int = 100,
+        columns: Optional[Sequence[str]] = None,
+        **filters
+    ) -> List[T]:
+        """Read one page of records by keyset (seek) pagination, newest first.
+        
+        Filters on (order key) < cursor rather than skipping rows, so every
+        page costs the same index range scan however deep it is.
+        
+        Args:
+            cursor: Order key values of the last record on the previous page,
+                as returned by next_cursor; None for the first page
+            limit: Maximum records to return
+            columns: Column names to load; others are deferred (all if None).
+                The order key is always loaded, for next_cursor
+            **filters: Optional field-value pairs for filtering
             
         Returns:
             List of model instances
         """
+        order_columns = self._order_columns()
+        if columns:
+            columns = [*columns, *self.model.__order_key__]
+        try:
+            query = self._query(columns).filter_by(**filters)
+            if cursor is not None:
+                query = query.filter(tuple_(*order_columns) < tuple_(*cursor))
+            return query.order_by(*(desc(col) for col in order_columns)).limit(limit).all()
+        except Exception as e:
+            logger.error("Error paginating %s: %s", self.model.__name__, e)
+            return []
+    
+    def _offset_page(
+        self,
+        skip: int,
+        limit: int,
+        columns: Optional[Sequence[str]] = None,
+        **filters
+    ) -> List[T]:
+        """OFFSET-based page in paginate's order, for legacy skip callers."""
         try:
-            return self.db.query(self.model).offset(skip).limit(limit).all()
+            return self._query(columns).filter_by(**filters).order_by(
+                *(desc(col) for col in self._order_columns())
+            ).offset(skip).limit(limit).all()
         except Exception as e:
-            logger.error(f"Error reading all {self.model.__name__}: {str(e)}")
+            logger.error("Error reading %s page: %s", self.model.__name__, e)
             return []
     
+    def next_cursor(self, page: List[T]) -> Optional[Tuple]:
+        """Cursor for the page after the given one.
+        
+        Args:
+            page: Records returned by paginate
+            
+        Returns:
+            Order key values of the last record, or None if the page is empty
+        """
+        if not page:
+            return None
+        return tuple(getattr(page[-1], key) for key in self.model.__order_key__)
+    
+    def _query(self, columns: Optional[Sequence[str]] = None) -> Query:
+        """Query for the model, loading only the named columns if given.
+        
+        Unloaded columns are deferred, so large Text/JSONB values are neither
+        transferred nor deserialized unless accessed.
+        """
+        query = self.db.query(self.model)
+        if columns:
+            query = query.options(load_only(*(self._columns[name] for name in columns)))
+        return query
+    
+    def _order_columns(self) -> List:
+        """Columns named by the model's __order_key__."""
+        order_key = getattr(self.model, "__order_key__", None)
+        if not order_key:
+            raise ValueError(f"{self.model.__name__} declares no __order_key__")
+        return [self._columns[key] for key in order_key]
+    
     def update(self, id: Any, obj_in: Dict[str, Any]) -> Optional[T]:
-        """Update a record.
+        """Update a record with a single UPDATE ... RETURNING statement.
+        
+        The row comes back with server-side onupdate values applied, so there
+        is no SELECT before or refresh after. Does not commit; wrap writes in
+        UnitOfWork.transaction().
         
         Args:
             id: Primary key value
-            obj_in: Dictionary with update data
+            obj_in: Dictionary with update data; keys that aren't columns
+                are ignored
             
         Returns:
             Updated model instance or None if not found
         """
+        values = {key: value for key, value in obj_in.items() if key in self._columns}
+        if not values:
+            return self.read(id)
         try:
-            db_obj = self.db.query(self.model).filter(self.model.id == id).first()
-            if not db_obj:
-                logger.warning(f"{self.model.__name__} with id {id} not found")
+            stmt = (
+                sql_update(self.model)
+                .where(self.model.id == id)
+                .values(**values)
+                .returning(self.model)
+                # Overwrite any copy already in the identity map with the new row
+                .execution_options(populate_existing=True)
+            )
+            db_obj = self.db.execute(stmt).scalar_one_or_none()
+            if db_obj is None:
+                logger.warning("%s with id %s not found", self.model.__name__, id)
                 return None
-            
-            for key, value in obj_in.items():
-                if hasattr(db_obj, key):
-                    setattr(db_obj, key, value)
-            
-            self.db.add(db_obj)
-            self.db.commit()
-            self.db.refresh(db_obj)
-            logger.info(f"Updated {self.model.__name__} with id {id}")
+            logger.info("Updated %s with id %s", self.model.__name__, id)
             return db_obj
         except Exception as e:
-            self.db.rollback()
-            logger.error(f"Error updating {self.model.__name__}: {str(e)}")
+            logger.error("Error updating %s: %s", self.model.__name__, e)
             raise
     
     def delete(self, id: Any) -> bool:
         """Delete a record.
         
+        Flushes without committing; wrap writes in UnitOfWork.transaction().
+        
         Args:
             id: Primary key value
             
@@ -115,18 +293,17 @@ class BaseRepository(Generic[T]):
             True if deleted, False if not found
         """
         try:
-            db_obj = self.db.query(self.model).filter(self.model.id == id).first()
+            db_obj = self.db.get(self.model, id)
             if not db_obj:
-                logger.warning(f"{self.model.__name__} with id {id} not found")
+                logger.warning("%s with id %s not found", self.model.__name__, id)
                 return False
             
             self.db.delete(db_obj)
-            self.db.commit()
-            logger.info(f"Deleted {self.model.__name__} with id {id}")
+            self.db.flush()
+            logger.info("Deleted %s with id %s", self.model.__name__, id)
             return True
         except Exception as e:
-            self.db.rollback()
-            logger.error(f"Error deleting {self.model.__name__}: {str(e)}")
+            logger.error("Error deleting %s: %s", self.model.__name__, e)
             raise
     
     def count(self, filters: Optional[Dict[str, Any]] = None) -> int:
@@ -143,12 +320,12 @@ class BaseRepository(Generic[T]):
             
             if filters:
                 for key, value in filters.items():
-                    if hasattr(self.model, key):
-                        query = query.filter(getattr(self.model, key) == value)
+                    if key in self._columns:
+                        query = query.filter(self._columns[key] == value)
             
             return query.count()
         except Exception as e:
-            logger.error(f"Error counting {self.model.__name__}: {str(e)}")
+            logger.error("Error counting %s: %s", self.model.__name__, e)
             return 0
     
     def exists(self, id: Any) -> bool:
@@ -160,48 +337,119 @@ class BaseRepository(Generic[T]):
         Returns:
             True if exists, False otherwise
         """
+        return self.exists_by(id=id)
+    
+    def exists_by(self, **filters) -> bool:
+        """Check if any record matches the given field values.
+        
+        Runs SELECT EXISTS(...), which stops at the first matching row
+        instead of counting or fetching every match.
+        
+        Args:
+            **filters: Field-value pairs to filter by
+            
+        Returns:
+            True if at least one record matches, False otherwise
+        """
         try:
-            return self.db.query(self.model).filter(self.model.id == id).first() is not None
+            conditions = [self._columns[key] == value for key, value in filters.items()]
+            return bool(self.db.query(sql_exists().where(*conditions)).scalar())
         except Exception as e:
-            logger.error(f"Error checking existence of {self.model.__name__}: {str(e)}")
+            logger.error("Error checking existence of %s: %s", self.model.__name__, e)
             return False
     
-    def filter_by(self, **kwargs) -> List[T]:
+    def filter_by(self, columns: Optional[Sequence[str]] = None, **kwargs) -> List[T]:
         """Filter records by field values.
         
         Args:
+            columns: Column names to load; others are deferred (all if None)
             **kwargs: Field-value pairs to filter by
             
         Returns:
             List of matching model instances
         """
         try:
-            return self.db.query(self.model).filter_by(**kwargs).all()
+            return self._query(columns).filter_by(**kwargs).all()
+        except Exception as e:
+            logger.error("Error filtering %s: %s", self.model.__name__, e)
+            return []
+    
+    def filter_by_metadata(self, criteria: Dict[str, Any], limit: int = 100) -> List[T]:
+        """Filter records whose metadata_json contains the given key-value pairs.
+        
+        Uses JSONB containment (@>) so the GIN jsonb_path_ops index applies;
+        extracting keys with ->/->> would fall back to a sequential scan.
+        
+        Args:
+            criteria: Nested dictionary that metadata_json must contain
+            limit: Maximum records to return
+            
+        Returns:
+            List of matching model instances
+        """
+        if "metadata_json" not in self._columns:
+            raise ValueError(f"{self.model.__name__} has no metadata_json column")
+        try:
+            return self.db.query(self.model).filter(
+                self.model.metadata_json.contains(criteria)
+            ).limit(limit).all()
+        except Exception as e:
+            logger.error("Error filtering %s by metadata: %s", self.model.__name__, e)
+            return []
+    
+    def filter_by_metadata_key(self, key: str, value: str, limit: int = 100) -> List[T]:
+        """Filter records by a single scalar metadata_json value.
+        
+        Keys listed in INDEXED_JSONB_PATHS are compared with ->> so their
+        btree expression index applies; any other key goes through
+        filter_by_metadata's containment filter instead.
+        
+        Args:
+            key: Top-level metadata_json key
+            value: Value the key must equal
+            limit: Maximum records to return
+            
+        Returns:
+            List of matching model instances
+        """
+        if key not in INDEXED_JSONB_PATHS.get(self.model.__tablename__, ()):
+            return self.filter_by_metadata({key: value}, limit=limit)
+        try:
+            return self.db.query(self.model).filter(
+                self.model.metadata_json[key].astext == value
+            ).limit(limit).all()
         except Exception as e:
-            logger.error(f"Error filtering {self.model.__name__}: {str(e)}")
+            logger.error("Error filtering %s by metadata key: %s", self.model.__name__, e)
             return []
     
-    def order_by(self, field: str, descending: bool = False, **filters) -> List[T]:
+    def order_by(
+        self,
+        field: str,
+        descending: bool = False,
+        columns: Optional[Sequence[str]] = None,
+        **filters
+    ) -> List[T]:
         """Get records ordered by field with optional filters.
         
         Args:
             field: Field name to order by
             descending: Sort in descending order if True
+            columns: Column names to load; others are deferred (all if None)
             **filters: Optional field-value pairs for filtering
             
         Returns:
             List of ordered model instances
         """
         try:
-            query = self.db.query(self.model)
+            query = self._query(columns)
             
             if filters:
                 for key, value in filters.items():
-                    if hasattr(self.model, key):
-                        query = query.filter(getattr(self.model, key) == value)
+                    if key in self._columns:
+                        query = query.filter(self._columns[key] == value)
             
-            if hasattr(self.model, field):
-                order_col = getattr(self.model, field)
+            order_col = self._columns.get(field)
+            if order_col is not None:
                 if descending:
                     query = query.order_by(desc(order_col))
                 else:
@@ -209,5 +457,5 @@ class BaseRepository(Generic[T]):
             
             return query.all()
         except Exception as e:
-            logger.error(f"Error ordering {self.model.__name__}: {str(e)}")
+            logger.error("Error ordering %s: %s", self.model.__name__, e)
             return []
@@ -0,0 +1,90 @@
+"""Interaction repository for user interaction data access."""
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy import desc, func
+
+from ..models import Interaction
+from .base_repository import BaseRepository
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InteractionRepository(BaseRepository[Interaction]):
+    """Repository for Interaction model operations."""
+
+    def __init__(self, db: Session):
+        """Initialize with database session and Interaction model."""
+        super().__init__(db, Interaction)
+
+    def get_interactions_by_proposition(
+        self,
+        proposition_id,
+        skip: int = 0,
+        limit: Optional[int] = None
+    ) -> List[Interaction]:
+        """Get a proposition's interactions, newest first.
+
+        Args:
+            proposition_id: Proposition ID to filter by
+            skip: Number of records to skip
+            limit: Maximum records to return (all if None)
+
+        Returns:
+            List of Interaction objects
+        """
+        try:
+            query = self.db.query(Interaction).filter(
+                Interaction.proposition_id == proposition_id
+            ).order_by(desc(Interaction.created_at)).offset(skip)
+            if limit is not None:
+                query = query.limit(limit)
+            return query.all()
+        except Exception as e:
+            logger.error("Error getting interactions by proposition: %s", e)
+            return []
+
+    def aggregate_by_users(self, user_ids: List, after_date: Optional[datetime] = None) -> Dict[Any, Dict[str, Dict[str, Any]]]:
+        """Aggregate interactions per user and type in a single GROUP BY query.
+
+        Args:
+            user_ids: User IDs to include
+            after_date: Optional cutoff; only interactions at or after it are counted
+
+        Returns:
+            Dictionary of user_id: {interaction_type: {count, duration_sum,
+            duration_count, first_at, last_at}}. Durations of zero are ignored,
+            as are NULLs. Users without interactions are omitted.
+        """
+        if not user_ids:
+            return {}
+        try:
+            # NULLIF drops zero durations so SUM/COUNT only see real dwell times
+            duration = func.nullif(Interaction.duration_seconds, 0)
+            query = self.db.query(
+                Interaction.user_id,
+                Interaction.interaction_type,
+                func.count(Interaction.id),
+                func.coalesce(func.sum(duration), 0),
+                func.count(duration),
+                func.min(Interaction.created_at),
+                func.max(Interaction.created_at),
+            ).filter(Interaction.user_id.in_(user_ids))
+            if after_date is not None:
+                query = query.filter(Interaction.created_at >= after_date)
+            rows = query.group_by(Interaction.user_id, Interaction.interaction_type).all()
+
+            aggregates: Dict[Any, Dict[str, Dict[str, Any]]] = {}
+            for user_id, interaction_type, count, duration_sum, duration_count, first_at, last_at in rows:
+                aggregates.setdefault(user_id, {})[interaction_type] = {
+                    "count": count,
+                    "duration_sum": float(duration_sum),
+                    "duration_count": duration_count,
+                    "first_at": first_at,
+                    "last_at": last_at,
+                }
+            return aggregates
+        except Exception as e:
+            logger.error("Error aggregating interactions by users: %s", e)
+            return {}
@@ -0,0 +1,66 @@
+"""Proposition repository for proposition entity data access."""
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import desc, func
+
+from ..models import Proposition
+from .base_repository import BaseRepository
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PropositionRepository(BaseRepository[Proposition]):
+    """Repository for Proposition model operations."""
+
+    def __init__(self, db: Session):
+        """Initialize with database session and Proposition model."""
+        super().__init__(db, Proposition)
+
+    def get_propositions_by_user(
+        self,
+        user_id,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        status: Optional[str] = None
+    ) -> List[Proposition]:
+        """Get a user's propositions, newest first.
+
+        Args:
+            user_id: User ID to filter by
+            skip: Number of records to skip
+            limit: Maximum records to return (all if None)
+            status: Optional status to filter by; 'pending' is served by
+                the idx_prop_pending_user partial index
+
+        Returns:
+            List of Proposition objects
+        """
+        try:
+            query = self.db.query(Proposition).filter(Proposition.user_id == user_id)
+            if status is not None:
+                query = query.filter(Proposition.status == status)
+            query = query.order_by(desc(Proposition.created_at)).offset(skip)
+            if limit is not None:
+                query = query.limit(limit)
+            return query.all()
+        except Exception as e:
+            logger.error("Error getting propositions by user: %s", e)
+            return []
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Count propositions per status in a single GROUP BY query.
+
+        Returns:
+            Dictionary of status: count, always including pending, accepted
+            and rejected
+        """
+        counts = {"pending": 0, "accepted": 0, "rejected": 0}
+        try:
+            rows = self.db.query(
+                Proposition.status, func.count(Proposition.id)
+            ).group_by(Proposition.status).all()
+            counts.update(rows)
+        except Exception as e:
+            logger.error("Error counting propositions by status: %s", e)
+        return counts
@@ -1,7 +1,7 @@
 """User repository for user entity data access."""
-from typing import Optional, List
+from typing import Optional, List, Sequence, Tuple
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload, raiseload
 from sqlalchemy import func
 
 from ..models import User
@@ -18,6 +18,36 @@ class UserRepository(BaseRepository[User]):
         """Initialize with database session and User model."""
         super().__init__(db, User)
     
+    def get_with_relations(
+        self,
+        user_id,
+        load: Sequence[str] = ("propositions", "interactions"),
+        strict: bool = False
+    ) -> Optional[User]:
+        """Get a user with relationships eagerly loaded.
+        
+        Each relationship in load costs one extra IN query up front instead of
+        a lazy SELECT on first access.
+        
+        Args:
+            user_id: User ID
+            load: Relationship names to load (propositions, interactions,
+                features, feature_vector)
+            strict: Raise on access to any relationship not in load, to catch
+                accidental lazy loads
+            
+        Returns:
+            User object or None if not found
+        """
+        options = [selectinload(getattr(User, name)) for name in load]
+        if strict:
+            options.append(raiseload("*"))
+        try:
+            return self.db.query(User).options(*options).filter(User.id == user_id).first()
+        except Exception as e:
+            logger.error("Error getting user with relations: %s", e)
+            return None
+    
     def get_by_username(self, username: str) -> Optional[User]:
         """Get user by username.
         
@@ -30,7 +60,7 @@ class UserRepository(BaseRepository[User]):
         try:
             return self.db.query(User).filter(User.username == username).first()
         except Exception as e:
-            logger.error(f"Error getting user by username: {str(e)}")
+            logger.error("Error getting user by username: %s", e)
             return None
     
     def get_by_email(self, email: str) -> Optional[User]:
@@ -45,44 +75,56 @@ class UserRepository(BaseRepository[User]):
         try:
             return self.db.query(User).filter(User.email == email).first()
         except Exception as e:
-            logger.error(f"Error getting user by email: {str(e)}")
+            logger.error("Error getting user by email: %s", e)
             return None
     
-    def get_active_users(self, skip: int = 0, limit: int = 100) -> List[User]:
-        """Get all active users with pagination.
+    def get_active_users(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[Tuple] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> List[User]:
+        """Get active users with pagination, newest first.
         
         Args:
-            skip: Number of records to skip
+            skip: Number of records to skip; ignored when cursor is given
             limit: Maximum records to return
+            cursor: Keyset cursor, the (created_at, id) of the last user on
+                the previous page (see next_cursor); seeks instead of
+                scanning past skip rows
+            columns: Column names to load; others are deferred (all if None)
             
         Returns:
             List of active User objects
         """
-        try:
-            return self.db.query(User).filter(
-                User.is_active == True
-            ).offset(skip).limit(limit).all()
-        except Exception as e:
-            logger.error(f"Error getting active users: {str(e)}")
-            return []
+        if skip and cursor is None:
+            return self._offset_page(skip, limit, columns, is_active=True)
+        return self.paginate(cursor, limit, columns, is_active=True)
     
-    def get_inactive_users(self, skip: int = 0, limit: int = 100) -> List[User]:
-        """Get all inactive users with pagination.
+    def get_inactive_users(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[Tuple] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> List[User]:
+        """Get inactive users with pagination, newest first.
         
         Args:
-            skip: Number of records to skip
+            skip: Number of records to skip; ignored when cursor is given
             limit: Maximum records to return
+            cursor: Keyset cursor, the (created_at, id) of the last user on
+                the previous page (see next_cursor); seeks instead of
+                scanning past skip rows
+            columns: Column names to load; others are deferred (all if None)
             
         Returns:
             List of inactive User objects
         """
-        try:
-            return self.db.query(User).filter(
-                User.is_active == False
-            ).offset(skip).limit(limit).all()
-        except Exception as e:
-            logger.error(f"Error getting inactive users: {str(e)}")
-            return []
+        if skip and cursor is None:
+            return self._offset_page(skip, limit, columns, is_active=False)
+        return self.paginate(cursor, limit, columns, is_active=False)
     
     def count_active_users(self) -> int:
         """Count total number of active users.
@@ -93,7 +135,7 @@ class UserRepository(BaseRepository[User]):
         try:
             return self.db.query(User).filter(User.is_active == True).count()
         except Exception as e:
-            logger.error(f"Error counting active users: {str(e)}")
+            logger.error("Error counting active users: %s", e)
             return 0
     
     def deactivate_user(self, user_id) -> bool:
@@ -105,22 +147,11 @@ class UserRepository(BaseRepository[User]):
         Returns:
             True if successful, False otherwise
         """
-        try:
-            user = self.read(user_id)
-            if not user:
-                logger.warning(f"User {user_id} not found")
-                return False
-            
-            user.is_active = False
-            user.updated_at = datetime.utcnow()
-            self.db.add(user)
-            self.db.commit()
-            logger.info(f"Deactivated user {user_id}")
-            return True
-        except Exception as e:
-            self.db.rollback()
-            logger.error(f"Error deactivating user: {str(e)}")
-            raise
+        # One UPDATE ... RETURNING; update logs misses and errors
+        if self.update(user_id, {"is_active": False}) is None:
+            return False
+        logger.info("Deactivated user %s", user_id)
+        return True
     
     def reactivate_user(self, user_id) -> bool:
         """Reactivate a user account.
@@ -131,22 +162,11 @@ class UserRepository(BaseRepository[User]):
         Returns:
             True if successful, False otherwise
         """
-        try:
-            user = self.read(user_id)
-            if not user:
-                logger.warning(f"User {user_id} not found")
-                return False
-            
-            user.is_active = True
-            user.updated_at = datetime.utcnow()
-            self.db.add(user)
-            self.db.commit()
-            logger.info(f"Reactivated user {user_id}")
-            return True
-        except Exception as e:
-            self.db.rollback()
-            logger.error(f"Error reactivating user: {str(e)}")
-            raise
+        # One UPDATE ... RETURNING; update logs misses and errors
+        if self.update(user_id, {"is_active": True}) is None:
+            return False
+        logger.info("Reactivated user %s", user_id)
+        return True
     
     def search_users(self, query: str, limit: int = 10) -> List[User]:
         """Search users by username or email.
@@ -165,7 +185,7 @@ class UserRepository(BaseRepository[User]):
                 (User.email.ilike(search_pattern))
             ).limit(limit).all()
         except Exception as e:
-            logger.error(f"Error searching users: {str(e)}")
+            logger.error("Error searching users: %s", e)
             return []
     
     def get_users_created_after(self, date: datetime) -> List[User]:
@@ -182,5 +202,5 @@ class UserRepository(BaseRepository[User]):
                 User.created_at >= date
             ).all()
         except Exception as e:
-            logger.error(f"Error getting users created after date: {str(e)}")
+            logger.error("Error getting users created after date: %s", e)
             return []